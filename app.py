@@ -33,11 +33,101 @@ if db_url and db_url.startswith("postgres://"):
 
 app.config["SQLALCHEMY_DATABASE_URI"] = db_url
 
+# Connection pool, per worker process. Size, overflow and timeout only apply to server databases;
+# pre-ping and recycle drop connections the server or a proxy closed while they sat idle.
+engine_options = {
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+}
+if db_url and not db_url.startswith("sqlite"):
+    engine_options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", 5)),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", 30)),
+    )
+# Behind PgBouncer in transaction mode no server-side state may outlive a transaction
+app.config["DB_PGBOUNCER"] = os.getenv("DB_PGBOUNCER", "false").lower() in ("1", "true", "yes")
+if app.config["DB_PGBOUNCER"] and db_url and db_url.startswith("postgresql+psycopg:"):
+    # psycopg 3 prepares repeated statements server-side; psycopg2 never does
+    engine_options["connect_args"] = {"prepare_threshold": None}
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options
+# Log each worker's pool usage every N seconds (0 = off); also served at /api/health/pool
+app.config["DB_POOL_LOG_SECONDS"] = int(os.getenv("DB_POOL_LOG_SECONDS", 0))
+
+# Uploaded avatars are stored on disk, keyed by content hash
+app.config["AVATAR_STORAGE_DIR"] = os.getenv("AVATAR_STORAGE_DIR", os.path.join('static', 'uploads', 'avatars'))
+app.config["AVATAR_MAX_BYTES"] = int(os.getenv("AVATAR_MAX_BYTES", 5 * 1024 * 1024))
+
+# Discussion media uploads are streamed to disk, keyed by content hash
+app.config["MEDIA_STORAGE_DIR"] = os.getenv("MEDIA_STORAGE_DIR", os.path.join('static', 'uploads', 'media'))
+app.config["MEDIA_MAX_BYTES"] = int(os.getenv("MEDIA_MAX_BYTES", 50 * 1024 * 1024))
+
+# Notification fan-outs above the threshold are written by background workers after commit
+app.config["NOTIFY_DEFER_THRESHOLD"] = int(os.getenv("NOTIFY_DEFER_THRESHOLD", 25))
+app.config["NOTIFY_WORKERS"] = int(os.getenv("NOTIFY_WORKERS", 2))
+
+# Push channels: 'memory' for a single worker, 'sqlite' to share events between local workers
+app.config["PUBSUB_BACKEND"] = os.getenv("PUBSUB_BACKEND", "memory")
+app.config["PUBSUB_SQLITE_PATH"] = os.getenv("PUBSUB_SQLITE_PATH", os.path.join('instance', 'pubsub.db'))
+app.config["PUBSUB_BUFFER_SIZE"] = int(os.getenv("PUBSUB_BUFFER_SIZE", 100))
+app.config["SSE_HEARTBEAT_SECONDS"] = int(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+app.config["SSE_MAX_SECONDS"] = int(os.getenv("SSE_MAX_SECONDS", 300))
+# Each stream holds a server thread, so keep this a small fraction of the worker's threads
+app.config["SSE_MAX_STREAMS"] = int(os.getenv("SSE_MAX_STREAMS", 2))
+app.config["CHAT_REPLAY_LIMIT"] = int(os.getenv("CHAT_REPLAY_LIMIT", 200))
+
+# Browse listings: largest page a client may request, and how far an estimated total counts
+app.config["MAX_PAGE_SIZE"] = int(os.getenv("MAX_PAGE_SIZE", 100))
+app.config["TOTAL_ESTIMATE_CAP"] = int(os.getenv("TOTAL_ESTIMATE_CAP", 1000))
+
+# Platform statistics are cached per process and dropped when their tables are written
+app.config["STATS_CACHE_TTL"] = int(os.getenv("STATS_CACHE_TTL", 60))
+
+# Hot ranking: engagement weights, age decay exponent, and how often scores are recomputed (0 = only via CLI)
+app.config["HOT_VOTE_WEIGHT"] = float(os.getenv("HOT_VOTE_WEIGHT", 1.0))
+app.config["HOT_COMMENT_WEIGHT"] = float(os.getenv("HOT_COMMENT_WEIGHT", 0.5))
+app.config["HOT_DONATION_WEIGHT"] = float(os.getenv("HOT_DONATION_WEIGHT", 1.0))
+app.config["HOT_GRAVITY"] = float(os.getenv("HOT_GRAVITY", 1.5))
+app.config["HOT_RECOMPUTE_SECONDS"] = int(os.getenv("HOT_RECOMPUTE_SECONDS", 600))
+# One serving process recomputes at a time; on databases other than Postgres it is elected with this file lock
+app.config["HOT_RECOMPUTE_LOCK_PATH"] = os.getenv("HOT_RECOMPUTE_LOCK_PATH", os.path.join('instance', 'hot-scores.lock'))
+
+# Trending discussions: activity weights and how often the in-memory index is rebuilt from the database
+app.config["TRENDING_LIKE_WEIGHT"] = float(os.getenv("TRENDING_LIKE_WEIGHT", 1.0))
+app.config["TRENDING_REPLY_WEIGHT"] = float(os.getenv("TRENDING_REPLY_WEIGHT", 2.0))
+app.config["TRENDING_RESYNC_SECONDS"] = int(os.getenv("TRENDING_RESYNC_SECONDS", 300))
+
+# Per-request query counts and DB time (Server-Timing header and a JSON log line);
+# a statement shape repeated more than QUERY_REPEAT_THRESHOLD times is logged as a likely N+1 (0 = off)
+app.config["QUERY_STATS_ENABLED"] = os.getenv("QUERY_STATS_ENABLED", "true").lower() in ("1", "true", "yes")
+app.config["QUERY_REPEAT_THRESHOLD"] = int(os.getenv("QUERY_REPEAT_THRESHOLD", 10))
+app.config["QUERY_SLOWEST_COUNT"] = int(os.getenv("QUERY_SLOWEST_COUNT", 3))
+
+# Prometheus metrics at /metrics. Each worker writes its values to METRICS_DIR, which a scrape
+# merges, so the directory must be shared by the workers; the server clears it when it starts
+app.config["METRICS_ENABLED"] = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+app.config["METRICS_DIR"] = os.getenv("METRICS_DIR", os.path.join('instance', 'metrics'))
+app.config["METRICS_FLUSH_SECONDS"] = float(os.getenv("METRICS_FLUSH_SECONDS", 5))
+app.config["METRICS_TOKEN"] = os.getenv("METRICS_TOKEN")  # When set, scrapes need "Authorization: Bearer <token>"
+
+# Bounds for serializing discussion reply trees
+app.config["THREAD_MAX_DEPTH"] = int(os.getenv("THREAD_MAX_DEPTH", 8))
+app.config["THREAD_MAX_CHILDREN"] = int(os.getenv("THREAD_MAX_CHILDREN", 100))
+app.config["THREAD_MAX_REPLIES"] = int(os.getenv("THREAD_MAX_REPLIES", 2000))
+
 # Initialize the app with the extension
 db.init_app(app)
 
 with app.app_context():
     # Import models to ensure tables are created
     import models  # noqa: F401
+    from migrations import run_migrations
+    from pool_metrics import track_pool
+    from query_stats import install_query_stats
+    from search import install_search_indexes
+    track_pool(db.engine)
+    install_query_stats(app, db.engine)
     db.create_all()
+    run_migrations()
+    install_search_indexes()
     logging.info("Database tables created successfully")
@@ -0,0 +1,131 @@
+import re
+import subprocess
+import time
+from datetime import datetime
+import numpy as np
+from sqlalchemy import event, func
+from app import app, db
+from models import (User, Project, Comment, Vote, Collaboration, Donation, Discussion, DiscussionReply,
+                    DiscussionLike, Notification, TeamChat)
+from seed import SEED_PASSWORD
+
+# Query-string variants benchmarked on top of every GET route
+VARIANTS = [
+    '/api/projects?sort=popular',
+    '/api/projects?sort=hot',
+    '/api/projects?category=Technology&total=exact',
+    '/api/discussions?sort=popular',
+    '/api/discussions?sort=trending&window=day',
+    '/api/discussions?search=solar campus',
+    '/api/users?search=python',
+    '/api/users?search=so&typeahead=1',
+]
+
+# Long-lived event streams never finish a response
+_SKIPPED = re.compile(r'/stream$')
+
+# Values for route arguments, by argument name
+_ARGUMENTS = {'project_id': 'project', 'discussion_id': 'discussion', 'user_id': 'user'}
+
+
+def benchmark_urls(ids):
+    """Every GET /api route filled in with the seeded ids, followed by VARIANTS"""
+    urls = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if 'GET' not in rule.methods or not rule.rule.startswith('/api/') or _SKIPPED.search(rule.rule):
+            continue
+        if any(argument not in _ARGUMENTS for argument in rule.arguments):
+            continue
+        url = rule.rule
+        for argument in rule.arguments:
+            url = re.sub(rf'<(?:\w+:)?{argument}>', str(ids[_ARGUMENTS[argument]]), url)
+        if url not in urls:
+            urls.append(url)
+    return urls + VARIANTS
+
+
+def table_counts():
+    models = [User, Project, Vote, Comment, Collaboration, Donation, TeamChat, Discussion, DiscussionReply,
+              DiscussionLike, Notification]
+    return {model.__tablename__: db.session.query(func.count(model.id)).scalar() for model in models}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(ids, repeat=20, warmup=2, progress=None):
+    """Time every benchmark url through the test client, logged in as the seeded user.
+    
+    Each url is requested `warmup` times untimed, then `repeat` times.
+    Returns a JSON-serializable report with p50/p95/max latency in
+    milliseconds, queries and response bytes per url.
+    """
+    client = app.test_client()
+    response = client.post('/api/login', json={'username': ids['username'], 'password': SEED_PASSWORD})
+    if response.status_code != 200:
+        raise RuntimeError(f'Could not log in as {ids["username"]}: {response.status_code}')
+    
+    queries = []
+    
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        queries.append(statement)
+    
+    results = []
+    event.listen(db.engine, 'before_cursor_execute', count_query)
+    try:
+        for url in benchmark_urls(ids):
+            for _ in range(warmup):
+                client.get(url)
+            
+            timings = []
+            counts = []
+            for _ in range(repeat):
+                queries.clear()
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+                counts.append(len(queries))
+            
+            results.append({
+                'url': url,
+                'status': response.status_code,
+                'p50_ms': round(float(np.percentile(timings, 50)), 2),
+                'p95_ms': round(float(np.percentile(timings, 95)), 2),
+                'max_ms': round(max(timings), 2),
+                'queries': max(counts),
+                'bytes': len(response.get_data()),
+            })
+            if progress:
+                progress(results[-1])
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_query)
+    
+    return {
+        'generated_at': datetime.utcnow().isoformat(),
+        'commit': _git_commit(),
+        'database': db.engine.dialect.name,
+        'rows': table_counts(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare_reports(baseline, current, tolerance=0.5):
+    """Urls whose p95 latency grew by more than `tolerance`, or that run more queries, than in `baseline`"""
+    before = {result['url']: result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = before.get(result['url'])
+        if old is None:
+            continue
+        if result['queries'] > old['queries']:
+            regressions.append(f"{result['url']}: {old['queries']} -> {result['queries']} queries")
+        # Ignore jitter of a couple of milliseconds on fast endpoints
+        if result['p95_ms'] > old['p95_ms'] * (1 + tolerance) and result['p95_ms'] - old['p95_ms'] > 2:
+            regressions.append(f"{result['url']}: p95 {old['p95_ms']}ms -> {result['p95_ms']}ms")
+    return regressions
@@ -0,0 +1,153 @@
+import base64
+import binascii
+import hashlib
+import io
+import itertools
+import os
+import tempfile
+from flask import current_app
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Square thumbnails are generated for embedded avatars; 'large' keeps the aspect ratio
+AVATAR_SIZES = {'small': 64, 'medium': 256, 'large': 1024}
+
+# Discussion media types a browser can render without running script, and how many
+# leading bytes sniff_media_type needs to tell them apart
+MEDIA_MIME_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp', 'video/mp4', 'video/webm')
+MEDIA_SNIFF_BYTES = 12
+
+
+class BlobStore:
+    """Content-addressed files on local disk, sharded by the first two hex digits of their SHA-256"""
+    
+    def __init__(self, root):
+        self.root = root
+    
+    def path_for(self, digest, suffix=''):
+        return os.path.join(self.root, digest[:2], f'{digest}{suffix}')
+    
+    def exists(self, digest, suffix=''):
+        return os.path.exists(self.path_for(digest, suffix))
+    
+    def write(self, digest, suffix, data):
+        """Write bytes atomically so readers never see a partially written blob"""
+        path = self.path_for(digest, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        return path
+
+
+class BlobTooLarge(ValueError):
+    pass
+
+
+def avatar_store():
+    return BlobStore(current_app.config['AVATAR_STORAGE_DIR'])
+
+
+def media_store():
+    return BlobStore(current_app.config['MEDIA_STORAGE_DIR'])
+
+
+def sniff_media_type(head):
+    """The MEDIA_MIME_TYPES entry the file starting with `head` is, from its magic bytes, else None"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'image/gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[4:8] == b'ftyp':
+        return 'video/mp4'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'video/webm'
+    return None
+
+
+def store_stream(store, stream, max_bytes, chunk_size=64 * 1024, head=b''):
+    """Copy a file-like stream into the store in chunks, hashing as it goes.
+    
+    `head` holds bytes already read from the stream, e.g. to sniff its type.
+    Nothing larger than one chunk is held in memory. Raises BlobTooLarge as soon
+    as more than max_bytes have been read. Returns (digest, size).
+    """
+    os.makedirs(store.root, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=store.root, prefix='.upload-')
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            for chunk in itertools.chain([head], iter(lambda: stream.read(chunk_size), b'')):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise BlobTooLarge('File is too large')
+                sha256.update(chunk)
+                tmp_file.write(chunk)
+        
+        digest = sha256.hexdigest()
+        path = store.path_for(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return digest, size
+
+
+def data_url_mime_type(data_url):
+    return data_url[5:].split(';', 1)[0].split(',', 1)[0] if data_url.startswith('data:') else ''
+
+
+def decode_data_url(data_url):
+    """Return the raw bytes of a base64 data URL such as 'data:image/png;base64,...'"""
+    header, _, payload = data_url.partition(',')
+    if not header.startswith('data:') or ';base64' not in header:
+        raise ValueError('Image must be a base64 data URL')
+    try:
+        return base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError('Image data is not valid base64')
+
+
+def store_avatar(data_url):
+    """Decode an uploaded avatar, store its thumbnails once and return the content hash"""
+    raw = decode_data_url(data_url)
+    if len(raw) > current_app.config['AVATAR_MAX_BYTES']:
+        raise ValueError('Profile image is too large')
+    
+    digest = hashlib.sha256(raw).hexdigest()
+    store = avatar_store()
+    if all(store.exists(digest, f'_{size}.webp') for size in AVATAR_SIZES):
+        return digest
+    
+    try:
+        image = Image.open(io.BytesIO(raw))
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValueError('Profile image is not a supported image file')
+    
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    
+    for size, pixels in AVATAR_SIZES.items():
+        if size == 'large':
+            variant = image.copy()
+            variant.thumbnail((pixels, pixels))
+        else:
+            variant = ImageOps.fit(image, (pixels, pixels))
+        buffer = io.BytesIO()
+        variant.save(buffer, 'WEBP', quality=85)
+        store.write(digest, f'_{size}.webp', buffer.getvalue())
+    
+    return digest
@@ -0,0 +1,188 @@
+import io
+import json
+import logging
+import time
+import click
+from app import app, db
+from benchmark import compare_reports, run_benchmark
+from blob_store import decode_data_url, data_url_mime_type, store_avatar
+from migrations import MIGRATIONS, applied_migrations, run_migrations
+from models import User, Discussion, reconcile_counters
+from query_plans import check_query_plans, describe_regression, seed_plan_dataset
+from seed import (DEFAULT_REPLY_DEPTH, DEFAULT_VOLUMES, SEED_PASSWORD, database_is_empty, sample_ids, seed_dataset,
+                  seed_volumes)
+from ranking import recompute_hot_scores
+from routes import create_media_asset
+
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply pending schema migrations."""
+    applied = run_migrations()
+    for name in applied:
+        click.echo(f'applied: {name}')
+    click.echo(f'{len(applied)} migration(s) applied')
+
+
+@app.cli.command('schema-version')
+def schema_version_command():
+    """List schema migrations and whether each has been applied."""
+    applied = applied_migrations()
+    for version, name, _ in MIGRATIONS:
+        status = f'applied {applied[version][1]:%Y-%m-%d %H:%M}' if version in applied else 'pending'
+        click.echo(f'{version:>3}  {name:<30} {status}')
+
+
+@app.cli.command('check-query-plans')
+@click.option('--scale', default=1, show_default=True, help='Multiplier for the seeded row counts.')
+def check_query_plans_command(scale):
+    """Seed an empty database, EXPLAIN every API query and fail on unindexed scans.
+    
+    Run against a scratch database (DATABASE_URL); it refuses to seed one that has users.
+    """
+    if not database_is_empty():
+        raise click.ClickException('check-query-plans seeds its own data; point DATABASE_URL at an empty database')
+    
+    ids = seed_plan_dataset(scale)
+    regressions = check_query_plans(ids)
+    for regression in regressions:
+        click.echo(describe_regression(*regression) + '\n', err=True)
+    if regressions:
+        raise click.ClickException(f'{len(regressions)} query plan(s) scan a table without an index')
+    click.echo('All API query plans use indexes')
+
+
+@app.cli.command('seed-dataset')
+@click.option('--scale', default=1.0, show_default=True, help='Multiplier for every default row count.')
+@click.option('--rows', multiple=True, metavar='TABLE=COUNT', help='Row count for one table, e.g. votes=2000000.')
+@click.option('--reply-depth', default=DEFAULT_REPLY_DEPTH, show_default=True)
+@click.option('--seed', default=1, show_default=True, help='Random seed; the same seed gives the same data.')
+def seed_dataset_command(scale, rows, reply_depth, seed):
+    """Bulk-load a synthetic dataset into an empty database for benchmarking.
+
+    At scale 1: 50k users, 20k projects, 1M votes, 500k notifications and
+    deep discussion reply trees, among others.
+    """
+    if not database_is_empty():
+        raise click.ClickException('seed-dataset only loads into an empty database')
+    
+    overrides = {}
+    for entry in rows:
+        table, _, count = entry.partition('=')
+        if table not in DEFAULT_VOLUMES or not count.isdigit():
+            raise click.BadParameter(f'expected TABLE=COUNT with TABLE one of {", ".join(DEFAULT_VOLUMES)}',
+                                     param_hint='--rows')
+        overrides[table] = int(count)
+    
+    started = time.perf_counter()
+    
+    def progress(table, count):
+        click.echo(f'{table}: {count} row(s) ({time.perf_counter() - started:.1f}s)')
+    
+    seed_dataset(seed_volumes(scale, overrides), reply_depth, seed, progress)
+    click.echo(f'Seeded in {time.perf_counter() - started:.1f}s; log in as user<id> / {SEED_PASSWORD}')
+
+
+@app.cli.command('benchmark')
+@click.option('--repeat', default=20, show_default=True, help='Timed requests per url.')
+@click.option('--warmup', default=2, show_default=True, help='Untimed requests per url first.')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), help='Write the JSON report here.')
+@click.option('--compare', 'baseline', type=click.File(), help='Earlier report to check for regressions.')
+@click.option('--tolerance', default=0.5, show_default=True, help='Allowed p95 growth against --compare.')
+def benchmark_command(repeat, warmup, output, baseline, tolerance):
+    """Time every GET API route on a seeded database and report latency, queries and payload size."""
+    # Per-request query logging would dominate the output
+    logging.getLogger().setLevel(logging.WARNING)
+    
+    def progress(result):
+        click.echo(f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['queries']:>4} "
+                   f"{result['bytes']:>9}  {result['url']}", err=True)
+    
+    click.echo(f"{'p50 ms':>9} {'p95 ms':>9} {'sql':>4} {'bytes':>9}  url", err=True)
+    report = run_benchmark(sample_ids(), repeat, warmup, progress)
+    
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        click.echo(json.dumps(report, indent=2))
+    
+    if baseline:
+        regressions = compare_reports(json.load(baseline), report, tolerance)
+        for line in regressions:
+            click.echo(line, err=True)
+        if regressions:
+            raise click.ClickException(f'{len(regressions)} regression(s) against the baseline')
+
+
+@app.cli.command('reconcile-counters')
+def reconcile_counters_command():
+    """Recompute denormalized vote/comment/collaboration/like/reply counters."""
+    repaired = reconcile_counters()
+    for counter, rows in repaired.items():
+        click.echo(f'{counter}: {rows} row(s) repaired')
+
+
+@app.cli.command('recompute-hot-scores')
+@click.option('--batch-size', default=5000, show_default=True)
+def recompute_hot_scores_command(batch_size):
+    """Re-apply time decay to every project's hot score."""
+    written = recompute_hot_scores(batch_size)
+    click.echo(f'{written} project score(s) updated')
+
+
+@app.cli.command('migrate-avatars')
+@click.option('--batch-size', default=100, show_default=True)
+def migrate_avatars_command(batch_size):
+    """Move base64 profile images from the users table into the avatar blob store."""
+    migrated = failed = 0
+    last_id = 0
+    while True:
+        users = User.query.filter(User.id > last_id, User.profile_image.like('data:%'))\
+                          .order_by(User.id).limit(batch_size).all()
+        if not users:
+            break
+        
+        for user in users:
+            last_id = user.id
+            try:
+                user.avatar_hash = store_avatar(user.profile_image)
+                user.profile_image = None
+                migrated += 1
+            except ValueError as e:
+                failed += 1
+                click.echo(f'user {user.id}: {e}', err=True)
+        db.session.commit()
+    
+    click.echo(f'{migrated} avatar(s) migrated, {failed} failed')
+
+
+@app.cli.command('migrate-discussion-media')
+@click.option('--batch-size', default=50, show_default=True)
+def migrate_discussion_media_command(batch_size):
+    """Move base64 discussion media out of the discussions table into the media store."""
+    migrated = failed = 0
+    last_id = 0
+    while True:
+        discussions = Discussion.query.filter(Discussion.id > last_id, Discussion.media_url.like('data:%'))\
+                                      .order_by(Discussion.id).limit(batch_size).all()
+        if not discussions:
+            break
+        
+        for discussion in discussions:
+            last_id = discussion.id
+            try:
+                asset = create_media_asset(io.BytesIO(decode_data_url(discussion.media_url)), discussion.user_id,
+                                           data_url_mime_type(discussion.media_url),
+                                           discussion.media_filename)
+                db.session.flush()
+                discussion.media_id = asset.id
+                discussion.media_type = asset.media_type
+                discussion.media_url = None
+                migrated += 1
+            except ValueError as e:
+                failed += 1
+                click.echo(f'discussion {discussion.id}: {e}', err=True)
+        db.session.commit()
+    
+    click.echo(f'{migrated} discussion media file(s) migrated, {failed} failed')
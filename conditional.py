@@ -0,0 +1,28 @@
+import hashlib
+import json
+from flask import Response, request, session
+
+
+def etag_for(*parts):
+    """Weak entity tag for a response built from `parts` (watermark rows, counters, parameters).
+    
+    The session's user and the full request path are always mixed in, since
+    responses carry per-user fields such as can_edit and is_liked.
+    """
+    payload = json.dumps([session.get('user_id'), request.full_path, parts], default=str, separators=(',', ':'))
+    return hashlib.sha1(payload.encode()).hexdigest()[:24]
+
+
+def not_modified(tag):
+    """A 304 response when the client's If-None-Match already holds `tag`, else None"""
+    if not request.if_none_match.contains_weak(tag):
+        return None
+    return with_etag(Response(status=304), tag)
+
+
+def with_etag(response, tag):
+    """Attach `tag` and make clients revalidate on every use instead of trusting a stale copy"""
+    response.set_etag(tag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
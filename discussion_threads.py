@@ -0,0 +1,92 @@
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from models import User, DiscussionReply, ReplyReaction
+
+
+def load_reply_thread(discussion_id, current_user_id=None, newest_first=False,
+                      max_depth=None, max_children=None, max_replies=None):
+    """Load a discussion's reply tree in a fixed number of queries.
+
+    All replies are fetched in one query, reaction counts in one grouped query,
+    the current user's reactions and the authors in one query each, and the
+    tree is assembled in memory. max_depth/max_children/max_replies default to
+    the THREAD_* config values and bound how much of a very large thread is
+    serialized; hidden children are reported through each node's more_replies,
+    counted with one grouped query when max_replies cuts the load short.
+
+    The load keeps the replies nearest the top of the requested order, so a
+    newest_first thread over max_replies drops its oldest replies. Returns
+    (top-level replies, number of top-level replies not shown).
+    """
+    config = current_app.config
+    max_depth = max_depth or config['THREAD_MAX_DEPTH']
+    max_children = max_children or config['THREAD_MAX_CHILDREN']
+    max_replies = max_replies or config['THREAD_MAX_REPLIES']
+    
+    order = DiscussionReply.id.desc() if newest_first else DiscussionReply.id
+    replies = DiscussionReply.query.filter_by(discussion_id=discussion_id)\
+                                   .order_by(order)\
+                                   .limit(max_replies + 1).all()
+    if not replies:
+        return [], 0
+    
+    # A truncated load misses children of the loaded replies, so count every
+    # reply's children in the database for more_replies
+    child_counts = None
+    if len(replies) > max_replies:
+        replies = replies[:max_replies]
+        child_counts = dict(db.session.query(DiscussionReply.parent_reply_id, func.count(DiscussionReply.id))
+                            .filter(DiscussionReply.discussion_id == discussion_id)
+                            .group_by(DiscussionReply.parent_reply_id).all())
+    # Children are attached oldest first in either order
+    if newest_first:
+        replies.reverse()
+    
+    author_ids = {reply.user_id for reply in replies}
+    authors = {user.id: user for user in User.query.filter(User.id.in_(author_ids)).all()}
+    
+    reaction_counts = {}
+    for reply_id, reaction_type, count in db.session.query(
+            ReplyReaction.reply_id, ReplyReaction.reaction_type, func.count(ReplyReaction.id)
+    ).join(DiscussionReply, ReplyReaction.reply_id == DiscussionReply.id)\
+     .filter(DiscussionReply.discussion_id == discussion_id)\
+     .group_by(ReplyReaction.reply_id, ReplyReaction.reaction_type).all():
+        reaction_counts[(reply_id, reaction_type)] = count
+    
+    user_reactions = set()
+    if current_user_id:
+        user_reactions = set(db.session.query(ReplyReaction.reply_id, ReplyReaction.reaction_type)
+                             .join(DiscussionReply, ReplyReaction.reply_id == DiscussionReply.id)
+                             .filter(DiscussionReply.discussion_id == discussion_id,
+                                     ReplyReaction.user_id == current_user_id).all())
+    
+    loaded_ids = {reply.id for reply in replies}
+    children = {}
+    top_level = []
+    for reply in replies:
+        if reply.parent_reply_id is None:
+            top_level.append(reply)
+        elif reply.parent_reply_id in loaded_ids:
+            children.setdefault(reply.parent_reply_id, []).append(reply)
+    
+    def serialize(reply, depth):
+        nested = children.get(reply.id, [])
+        shown = nested[:max_children] if depth < max_depth else []
+        return reply.to_dict(current_user_id, prefetched={
+            'author': authors.get(reply.user_id),
+            'likes': reaction_counts.get((reply.id, 'like'), 0),
+            'hearts': reaction_counts.get((reply.id, 'heart'), 0),
+            'user_reactions': {
+                'like': (reply.id, 'like') in user_reactions,
+                'heart': (reply.id, 'heart') in user_reactions,
+            } if current_user_id else {},
+            'nested_replies': [serialize(child, depth + 1) for child in shown],
+            'more_replies': (child_counts.get(reply.id, 0) if child_counts is not None else len(nested)) - len(shown)
+        })
+    
+    if newest_first:
+        top_level.reverse()
+    # Top-level replies are counted under the None key
+    hidden = child_counts.get(None, 0) - len(top_level) if child_counts is not None else 0
+    return [serialize(reply, 1) for reply in top_level], hidden
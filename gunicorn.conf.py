@@ -0,0 +1,14 @@
+# gunicorn reads ./gunicorn.conf.py on start; render.yaml also passes it explicitly
+
+
+def on_starting(server):
+    # In the master before any worker forks: metrics of the previous deployment start over
+    from app import app
+    from metrics import clear_metrics_dir
+    clear_metrics_dir(app.config['METRICS_DIR'])
+
+
+def post_worker_init(worker):
+    # Periodic jobs belong to serving workers only, never to `flask` CLI commands
+    from main import start_background_jobs
+    start_background_jobs()
@@ -0,0 +1,279 @@
+"""Drive a weighted mix of real user flows against a running server and report per-endpoint load figures.
+
+Virtual users log in as seeded accounts (see `flask seed-dataset`), then
+loop over flows picked by weight with an exponential think time between
+them. The ramp profile adds users in steps; the soak profile holds them
+all for the whole run. Run it from the repository with the server's
+environment (DATABASE_URL), since the seeded password comes from seed.py.
+Usage:
+
+    python loadtest.py --start --workers 4 --users 100 --duration 300 --profile ramp
+"""
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from http.cookiejar import CookieJar
+import click
+import numpy as np
+from seed import SEED_PASSWORD
+
+# Flow name -> relative weight
+DEFAULT_MIX = {
+    'browse': 30,
+    'read_discussion': 25,
+    'notification_poll': 20,
+    'chat_poll': 15,
+    'vote': 5,
+    'donate': 5,
+}
+
+
+class Recorder:
+    """Collects (started, endpoint, seconds, ok) samples from every virtual user"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []
+    
+    def add(self, started, endpoint, seconds, ok):
+        with self._lock:
+            self.samples.append((started, endpoint, seconds, ok))
+
+
+class VirtualUser:
+    """One logged-in browser session replaying flows"""
+    
+    def __init__(self, base_url, username, recorder, rng):
+        self.base_url = base_url
+        self.username = username
+        self.recorder = recorder
+        self.rng = rng
+        # Standard library only, so the generator runs anywhere the repo does
+        self.http = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+        self.project_ids = []
+        self.discussion_ids = []
+        self.own_project_ids = []
+        self.last_chat_ids = {}
+    
+    def request(self, method, path, endpoint=None, json_body=None):
+        """Make one request, record it under `endpoint` (the path by default) and return the JSON body or None"""
+        data = json.dumps(json_body).encode() if json_body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'} if data else {})
+        started = time.time()
+        clock = time.perf_counter()
+        body = None
+        try:
+            with self.http.open(request, timeout=30) as response:
+                body = response.read()
+            ok = True
+        except (urllib.error.URLError, OSError):
+            # HTTPError (4xx/5xx) is a URLError
+            ok = False
+        self.recorder.add(started, endpoint or f'{method} {path}', time.perf_counter() - clock, ok)
+        if ok:
+            try:
+                return json.loads(body)
+            except ValueError:
+                return None
+        return None
+    
+    def login(self):
+        data = self.request('POST', '/api/login', json_body={'username': self.username, 'password': SEED_PASSWORD})
+        if data is None:
+            return False
+        dashboard = self.request('GET', '/api/dashboard/stats') or {}
+        self.own_project_ids = [project['id'] for project in dashboard.get('projects', [])]
+        return True
+    
+    def browse(self):
+        sort = self.rng.choice(['recent', 'recent', 'popular', 'hot'])
+        data = self.request('GET', f'/api/projects?sort={sort}&total=none', 'GET /api/projects') or {}
+        self.project_ids = [project['id'] for project in data.get('projects', [])] or self.project_ids
+        if data.get('next_cursor') and self.rng.random() < 0.3:
+            self.request('GET', f'/api/projects?sort={sort}&cursor={data["next_cursor"]}', 'GET /api/projects')
+        if self.project_ids:
+            project_id = self.rng.choice(self.project_ids)
+            self.request('GET', f'/api/projects/{project_id}', 'GET /api/projects/<id>')
+            self.request('GET', f'/api/projects/{project_id}/comments', 'GET /api/projects/<id>/comments')
+    
+    def read_discussion(self):
+        data = self.request('GET', '/api/discussions?total=none', 'GET /api/discussions') or {}
+        self.discussion_ids = [discussion['id'] for discussion in data.get('discussions', [])] or self.discussion_ids
+        if self.discussion_ids:
+            discussion_id = self.rng.choice(self.discussion_ids)
+            self.request('GET', f'/api/discussions/{discussion_id}', 'GET /api/discussions/<id>')
+            self.request('GET', f'/api/discussions/{discussion_id}/replies', 'GET /api/discussions/<id>/replies')
+    
+    def notification_poll(self):
+        count = self.request('GET', '/api/notifications/count') or {}
+        if count.get('unread_count') and self.rng.random() < 0.3:
+            self.request('GET', '/api/notifications')
+    
+    def chat_poll(self):
+        if not self.own_project_ids:
+            return self.notification_poll()
+        project_id = self.rng.choice(self.own_project_ids)
+        last_id = self.last_chat_ids.get(project_id)
+        query = f'?after_id={last_id}' if last_id else ''
+        data = self.request('GET', f'/api/projects/{project_id}/chat{query}', 'GET /api/projects/<id>/chat') or {}
+        messages = data.get('messages') or []
+        if messages:
+            self.last_chat_ids[project_id] = max(message['id'] for message in messages)
+    
+    def vote(self):
+        if not self.project_ids:
+            return self.browse()
+        project_id = self.rng.choice(self.project_ids)
+        # The endpoint takes no body: it toggles the user's upvote
+        self.request('POST', f'/api/projects/{project_id}/vote', 'POST /api/projects/<id>/vote')
+    
+    def donate(self):
+        if not self.project_ids:
+            return self.browse()
+        project_id = self.rng.choice(self.project_ids)
+        self.request('POST', f'/api/projects/{project_id}/donate', 'POST /api/projects/<id>/donate',
+                     json_body={'amount': self.rng.choice([5, 10, 25]), 'message': 'load test'})
+
+
+def stages(profile, users, duration, steps):
+    """[(start offset seconds, active users)] for the run"""
+    if profile == 'soak':
+        return [(0, users)]
+    steps = max(min(steps, users), 1)
+    return [(duration * i / steps, max(users * (i + 1) // steps, 1)) for i in range(steps)]
+
+
+def summarize(samples, started, finished):
+    """Per-endpoint throughput, latency percentiles (ms) and error rate for samples in [started, finished)"""
+    by_endpoint = defaultdict(list)
+    for at, endpoint, seconds, ok in samples:
+        if started <= at < finished:
+            by_endpoint[endpoint].append((seconds, ok))
+    elapsed = max(finished - started, 1e-9)
+    
+    summary = {}
+    for endpoint, results in sorted(by_endpoint.items()):
+        latencies = np.array([seconds for seconds, _ in results]) * 1000
+        errors = sum(1 for _, ok in results if not ok)
+        summary[endpoint] = {
+            'requests': len(results),
+            'rps': round(len(results) / elapsed, 2),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 1),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 1),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 1),
+            'error_rate': round(errors / len(results), 4),
+        }
+    return summary
+
+
+def print_summary(title, summary):
+    click.echo(f'\n{title}')
+    click.echo(f"{'requests':>9} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}  endpoint")
+    for endpoint, row in summary.items():
+        click.echo(f"{row['requests']:>9} {row['rps']:>8.1f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+                   f"{row['p99_ms']:>8.1f} {row['error_rate']:>7.1%}  {endpoint}")
+    total = sum(row['requests'] for row in summary.values())
+    click.echo(f"{total:>9} {sum(row['rps'] for row in summary.values()):>8.1f}  total")
+
+
+def start_server(port, workers, threads):
+    """Start gunicorn with the production worker class on `port` and wait until it answers"""
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--worker-class', 'gthread',
+                                '--workers', str(workers), '--threads', str(threads),
+                                '--bind', f'127.0.0.1:{port}', 'main:app'])
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise click.ClickException('gunicorn exited during startup')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health/pool', timeout=1).close()
+            return process
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    process.terminate()
+    raise click.ClickException('gunicorn did not start within 60s')
+
+
+@click.command()
+@click.option('--url', default='http://127.0.0.1:8000', show_default=True, help='Server to load (ignored with --start).')
+@click.option('--start', is_flag=True, help='Start gunicorn on --port for the run and stop it afterwards.')
+@click.option('--port', default=8100, show_default=True)
+@click.option('--workers', default=2, show_default=True, help='gunicorn workers with --start.')
+@click.option('--threads', default=8, show_default=True, help='Threads per gunicorn worker with --start.')
+@click.option('--users', default=20, show_default=True, help='Concurrent virtual users at full load.')
+@click.option('--user-pool', default=1000, show_default=True, help='Log in as seeded users user1..userN.')
+@click.option('--duration', default=60, show_default=True, help='Seconds to run.')
+@click.option('--profile', type=click.Choice(['ramp', 'soak']), default='ramp', show_default=True)
+@click.option('--steps', default=4, show_default=True, help='Ramp profile: user increments.')
+@click.option('--think', default=1.0, show_default=True, help='Mean seconds between flows per user.')
+@click.option('--mix', default=None, help='Flow weights, e.g. browse=50,vote=10 (unlisted flows keep defaults).')
+@click.option('--seed', default=1, show_default=True)
+@click.option('--json', 'json_path', type=click.Path(dir_okay=False), help='Also write the report as JSON.')
+def main(url, start, port, workers, threads, users, user_pool, duration, profile, steps, think, mix, seed,
+         json_path):
+    """Replay a realistic traffic mix against a local server."""
+    weights = dict(DEFAULT_MIX)
+    for entry in filter(None, (mix or '').split(',')):
+        flow, _, weight = entry.partition('=')
+        if flow not in DEFAULT_MIX or not weight.isdigit():
+            raise click.BadParameter(f'expected FLOW=WEIGHT with FLOW one of {", ".join(DEFAULT_MIX)}',
+                                     param_hint='--mix')
+        weights[flow] = int(weight)
+    flows, flow_weights = zip(*((flow, weight) for flow, weight in weights.items() if weight))
+    
+    server = start_server(port, workers, threads) if start else None
+    base_url = f'http://127.0.0.1:{port}' if start else url.rstrip('/')
+    
+    recorder = Recorder()
+    plan = stages(profile, users, duration, steps)
+    began = time.time()
+    finish = began + duration
+    
+    def run(index):
+        rng = random.Random(seed * 100_003 + index)
+        # Users join at the first stage that includes them
+        start_offset = next(offset for offset, active in plan if active > index)
+        time.sleep(start_offset)
+        user = VirtualUser(base_url, f'user{rng.randint(1, user_pool)}', recorder, rng)
+        if not user.login():
+            return
+        while time.time() < finish:
+            getattr(user, rng.choices(flows, flow_weights)[0])()
+            time.sleep(min(rng.expovariate(1 / think) if think > 0 else 0, max(finish - time.time(), 0)))
+    
+    threads_ = [threading.Thread(target=run, args=(index,), daemon=True) for index in range(users)]
+    try:
+        for thread in threads_:
+            thread.start()
+        for thread in threads_:
+            thread.join()
+    finally:
+        ended = time.time()
+        if server is not None:
+            server.terminate()
+            server.wait()
+    
+    report = {'profile': profile, 'users': users, 'duration': duration, 'mix': weights, 'stages': []}
+    for i, (offset, active) in enumerate(plan):
+        end = plan[i + 1][0] if i + 1 < len(plan) else ended - began
+        summary = summarize(recorder.samples, began + offset, began + end)
+        report['stages'].append({'start': offset, 'users': active, 'endpoints': summary})
+        if len(plan) > 1:
+            print_summary(f'Stage {i + 1}: {active} user(s), {offset:.0f}-{end:.0f}s', summary)
+    report['overall'] = summarize(recorder.samples, began, ended)
+    print_summary(f'Overall: {duration}s, {profile} to {users} user(s)', report['overall'])
+    
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,31 @@
-from app import app
+import os
+from app import app, db
 import routes  # noqa: F401
+import commands  # noqa: F401
+from metrics import clear_metrics_dir, install_metrics, start_metrics_flusher
+from pool_metrics import start_pool_logger
+from ranking import start_hot_score_refresher
+
+install_metrics(app)
+
+
+def start_background_jobs():
+    """Start the periodic jobs of a process that serves requests.
+    
+    gunicorn calls this in each worker (see gunicorn.conf.py) and the
+    development server below calls it once; importing main never does, so
+    `flask` CLI commands run without them.
+    """
+    start_hot_score_refresher(app)
+    start_metrics_flusher(app)
+    with app.app_context():
+        start_pool_logger(app, db.engine)
+
 
 if __name__ == "__main__":
+    # With debug the reloader re-runs this module in the child that serves
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_jobs()
+    else:
+        clear_metrics_dir(app.config["METRICS_DIR"])
     app.run(host="0.0.0.0", port=8000, debug=True)
@@ -0,0 +1,331 @@
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, current_app, g, request
+from app import db
+from pool_metrics import pool_status
+
+# Seconds, for request latency
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Statements per request
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+# Recipients per notification
+FANOUT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 1000, 5000)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests served, by route and status', None),
+    'http_request_duration_seconds': ('histogram', 'Request latency, by route', LATENCY_BUCKETS),
+    'http_requests_in_flight': ('gauge', 'Requests currently being handled', None),
+    'db_queries_total': ('counter', 'SQL statements executed by requests, by route', None),
+    'db_queries_per_request': ('histogram', 'SQL statements per request, by route', QUERY_BUCKETS),
+    'db_query_duration_seconds_total': ('counter', 'Time requests spent in SQL statements, by route', None),
+    'db_pool_checked_out': ('gauge', 'Pooled connections in use', None),
+    'db_pool_idle': ('gauge', 'Pooled connections idle', None),
+    'db_pool_overflow': ('gauge', 'Connections open beyond the pool size', None),
+    'notification_fanout_recipients': ('histogram', 'Recipients per notification, by delivery', FANOUT_BUCKETS),
+}
+
+
+class Registry:
+    """This process's metric values; counters and histograms only grow, gauges are set"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+    
+    def inc(self, name, labels=None, amount=1):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def set(self, name, value, labels=None):
+        with self._lock:
+            self._values[(name, tuple(sorted((labels or {}).items())))] = value
+    
+    def observe(self, name, value, labels=None):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            # Per-bucket counts (not yet cumulative), then sum and count
+            histogram = self._values.setdefault(key, [0] * len(buckets) + [0, 0])
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+    
+    def snapshot(self):
+        with self._lock:
+            return [[name, list(labels), list(value) if isinstance(value, list) else value]
+                    for (name, labels), value in self._values.items()]
+
+
+registry = Registry()
+
+
+ARCHIVE_FILE = 'archived.json'
+LOCK_FILE = 'metrics.lock'
+
+
+def _start_time(pid):
+    """Kernel start time of pid, so a recycled pid reads as a different process; None when not running"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # Fields after the parenthesised command name; starttime is the 20th
+            return f.read().rsplit(')', 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+_process_key = None
+
+
+def process_key():
+    """<pid>-<start time> naming this process's snapshot file"""
+    global _process_key
+    pid = os.getpid()
+    # Recomputed after a fork, e.g. when gunicorn preloads the app
+    if _process_key is None or not _process_key.startswith(f'{pid}-'):
+        # Without /proc the time of the first snapshot stands in for the start time
+        _process_key = f'{pid}-{_start_time(pid) or int(time.time())}'
+    return _process_key
+
+
+def _running(key):
+    pid, start = key.split('-', 1)
+    if int(pid) == os.getpid():
+        return key == process_key()
+    if os.path.isdir('/proc'):
+        return _start_time(int(pid)) == start
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _directory_lock(directory, mode):
+    """Shared for reading snapshots, exclusive for folding them into the archive"""
+    with open(os.path.join(directory, LOCK_FILE), 'a') as handle:
+        fcntl.flock(handle, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _write_json(directory, filename, data):
+    # Write then rename, so readers never see a partial file
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(temporary, os.path.join(directory, filename))
+
+
+def _read_samples(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(merged, samples, gauges=True):
+    for name, labels, value in samples:
+        if name not in METRICS or (METRICS[name][0] == 'gauge' and not gauges):
+            continue
+        key = (name, tuple(tuple(pair) for pair in labels))
+        if isinstance(value, list):
+            merged[key] = [a + b for a, b in zip(merged[key], value)] if key in merged else value
+        else:
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def write_snapshot():
+    """Publish this worker's values for the other workers' /metrics scrapes"""
+    directory = current_app.config['METRICS_DIR']
+    os.makedirs(directory, exist_ok=True)
+    status = pool_status(db.engine)
+    for gauge, field in (('db_pool_checked_out', 'checked_out'), ('db_pool_idle', 'idle'),
+                         ('db_pool_overflow', 'overflow')):
+        if status[field] is not None:
+            registry.set(gauge, status[field])
+    _write_json(directory, f'{process_key()}.json', registry.snapshot())
+
+
+def _snapshots(directory):
+    """(key, path) of every worker snapshot in directory"""
+    for filename in os.listdir(directory):
+        key = filename[:-5]
+        if filename.endswith('.json') and filename != ARCHIVE_FILE and '-' in key:
+            yield key, os.path.join(directory, filename)
+
+
+def archive_exited_workers(directory):
+    """Fold the snapshots of exited workers into archived.json and delete them.
+    
+    Their counters and histograms keep counting toward the totals, so those
+    never go backwards when gunicorn recycles a worker; their gauges are
+    dropped. Each worker runs this when it starts.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with _directory_lock(directory, fcntl.LOCK_EX):
+        exited = [(key, path) for key, path in _snapshots(directory) if not _running(key)]
+        if not exited:
+            return 0
+        archived = _merge({}, _read_samples(os.path.join(directory, ARCHIVE_FILE)) or [])
+        for _, path in exited:
+            _merge(archived, _read_samples(path) or [], gauges=False)
+        _write_json(directory, ARCHIVE_FILE, [[name, list(labels), value]
+                                              for (name, labels), value in archived.items()])
+        for _, path in exited:
+            os.remove(path)
+    return len(exited)
+
+
+def clear_metrics_dir(directory):
+    """Delete every snapshot and the archive so a new deployment starts from zero.
+    
+    Called by the gunicorn master before it forks workers (gunicorn.conf.py)
+    and by the development server; never while workers are writing.
+    """
+    if not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if filename.endswith(('.json', '.tmp')):
+            os.remove(os.path.join(directory, filename))
+
+
+def collect():
+    """Merge the archive and every worker's snapshot: counters and histograms summed, gauges summed over live workers"""
+    write_snapshot()
+    directory = current_app.config['METRICS_DIR']
+    # Shared, so an archive pass never shows a worker's values twice or not at all
+    with _directory_lock(directory, fcntl.LOCK_SH):
+        merged = _merge({}, _read_samples(os.path.join(directory, ARCHIVE_FILE)) or [])
+        for key, path in _snapshots(directory):
+            samples = _read_samples(path)
+            if samples is not None:
+                _merge(merged, samples, gauges=_running(key))
+    return merged
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+def exposition(merged):
+    """Render merged values in the Prometheus text format"""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for (metric, labels), value in sorted(merged.items()):
+            if metric != name:
+                continue
+            if kind != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {value[-1]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {value[-2]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _route():
+    # The URL rule keeps label cardinality bounded; unmatched paths share one label
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    registry.inc('http_requests_in_flight')
+
+
+def _record_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _finish_request(exception):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    registry.inc('http_requests_in_flight', amount=-1)
+    
+    route = _route()
+    status = g.pop('metrics_status', 500)
+    registry.inc('http_requests_total', {'method': request.method, 'route': route, 'status': str(status)})
+    registry.observe('http_request_duration_seconds', time.perf_counter() - started,
+                     {'method': request.method, 'route': route})
+    
+    # Filled in by query_stats when per-request query stats are enabled
+    stats = g.get('query_stats')
+    if stats is not None:
+        registry.inc('db_queries_total', {'route': route}, stats['count'])
+        registry.inc('db_query_duration_seconds_total', {'route': route}, stats['seconds'])
+        registry.observe('db_queries_per_request', stats['count'], {'route': route})
+
+
+def metrics_response():
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(exposition(collect()), mimetype='text/plain; version=0.0.4')
+
+
+def install_metrics(flask_app):
+    """Record request metrics and serve them, merged across workers, at /metrics.
+    
+    Each worker keeps its values in memory and writes them to
+    METRICS_DIR/<pid>-<start time>.json every METRICS_FLUSH_SECONDS (see
+    start_metrics_flusher) and whenever it serves a scrape; a scrape merges
+    every worker's file with archived.json, where exited workers' counters
+    are folded. The directory is cleared when the server starts (see
+    clear_metrics_dir).
+    """
+    if not flask_app.config['METRICS_ENABLED']:
+        return
+    flask_app.before_request(_start_request)
+    flask_app.after_request(_record_status)
+    flask_app.teardown_request(_finish_request)
+    flask_app.add_url_rule('/metrics', 'metrics', metrics_response)
+
+
+def start_metrics_flusher(flask_app):
+    """Archive exited workers' snapshots, then write this worker's every METRICS_FLUSH_SECONDS in a daemon thread"""
+    if not flask_app.config['METRICS_ENABLED']:
+        return None
+    archive_exited_workers(flask_app.config['METRICS_DIR'])
+    
+    def run():
+        while True:
+            time.sleep(flask_app.config['METRICS_FLUSH_SECONDS'])
+            with flask_app.app_context():
+                try:
+                    write_snapshot()
+                except Exception:
+                    logging.exception('Writing metrics snapshot failed')
+    
+    thread = threading.Thread(target=run, name='metrics', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,152 @@
+import logging
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+# One row per applied migration
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('name', db.String(200), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+# Arbitrary key so concurrently booting Postgres workers migrate one at a time
+_ADVISORY_LOCK_KEY = 7140
+
+
+def add_column(table_name, column_name):
+    """Add a column declared on the models to an existing table, if it is missing.
+    
+    db.create_all() only creates missing tables, so databases created by an
+    older release get new columns here, with their server defaults.
+    """
+    inspector = inspect(db.engine)
+    if column_name in {column['name'] for column in inspector.get_columns(table_name)}:
+        return False
+    
+    column = db.metadata.tables[table_name].columns[column_name]
+    dialect = db.engine.dialect
+    ddl = f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column.type.compile(dialect=dialect)}'
+    if column.server_default is not None:
+        ddl += f' DEFAULT {column.server_default.arg}'
+    if not column.nullable and column.server_default is not None:
+        ddl += ' NOT NULL'
+    with db.engine.begin() as connection:
+        connection.execute(text(ddl))
+    logging.info(f'Added column {table_name}.{column_name}')
+    return True
+
+
+def create_index(table_name, index_name):
+    """Create an index declared on the models, if it does not exist yet"""
+    index = next(index for index in db.metadata.tables[table_name].indexes if index.name == index_name)
+    with db.engine.begin() as connection:
+        index.create(connection, checkfirst=True)
+
+
+def _denormalized_counters():
+    from models import reconcile_counters
+    for table_name, column_name in [('projects', 'vote_count'), ('projects', 'comment_count'),
+                                    ('projects', 'collaboration_count'), ('discussions', 'like_count'),
+                                    ('discussions', 'reply_count')]:
+        add_column(table_name, column_name)
+    create_index('projects', 'ix_projects_vote_count')
+    create_index('discussions', 'ix_discussions_like_count')
+    reconcile_counters()
+
+
+def _blob_references():
+    add_column('users', 'avatar_hash')
+    add_column('discussions', 'media_id')
+
+
+def _paging_indexes():
+    create_index('team_chats', 'ix_team_chats_project_id_id')
+    create_index('projects', 'ix_projects_created_at_id')
+    create_index('discussions', 'ix_discussions_created_at_id')
+
+
+def _hot_score():
+    from ranking import recompute_hot_scores
+    add_column('projects', 'hot_score')
+    create_index('projects', 'ix_projects_hot_score')
+    recompute_hot_scores()
+
+
+def _lookup_indexes():
+    create_index('votes', 'ix_votes_project_id_is_upvote')
+    create_index('notifications', 'ix_notifications_user_id_is_read_created_at')
+    create_index('comments', 'ix_comments_project_id_created_at')
+    create_index('collaborations', 'ix_collaborations_project_id_status')
+    create_index('discussion_replies', 'ix_discussion_replies_discussion_id_parent_reply_id')
+    # Foreign keys and filters the API looks rows up by
+    create_index('projects', 'ix_projects_user_id')
+    create_index('projects', 'ix_projects_category_created_at_id')
+    create_index('discussions', 'ix_discussions_category_created_at_id')
+    create_index('comments', 'ix_comments_user_id_created_at')
+    create_index('donations', 'ix_donations_user_id_created_at')
+    create_index('comment_reactions', 'ix_comment_reactions_comment_id')
+    create_index('project_attachments', 'ix_project_attachments_project_id')
+    # Trending resyncs read the last week of activity
+    create_index('discussion_likes', 'ix_discussion_likes_created_at')
+    create_index('discussion_replies', 'ix_discussion_replies_created_at')
+
+
+def _user_updated_at():
+    # Rows from before this column existed fall back to created_at wherever it is read
+    add_column('users', 'updated_at')
+
+
+# Applied in order, each exactly once per database. Every step is idempotent so
+# databases that were upgraded before versioning existed are simply stamped.
+MIGRATIONS = [
+    (1, 'denormalized counters', _denormalized_counters),
+    (2, 'blob store references', _blob_references),
+    (3, 'keyset paging indexes', _paging_indexes),
+    (4, 'hot score', _hot_score),
+    (5, 'lookup indexes', _lookup_indexes),
+    (6, 'user updated_at', _user_updated_at),
+]
+
+
+def applied_migrations():
+    """Map of applied version -> (name, applied_at)"""
+    rows = db.session.execute(db.select(schema_migrations)).all()
+    return {row.version: (row.name, row.applied_at) for row in rows}
+
+
+def run_migrations():
+    """Apply pending migrations in version order and return the names applied"""
+    schema_migrations.create(db.engine, checkfirst=True)
+    
+    lock = None
+    if db.engine.dialect.name == 'postgresql':
+        # Held by an open transaction rather than the session, so it is released
+        # with that transaction even when PgBouncer multiplexes server connections
+        lock = db.engine.connect()
+        lock.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': _ADVISORY_LOCK_KEY})
+    
+    try:
+        done = applied_migrations()
+        applied = []
+        for version, name, upgrade in MIGRATIONS:
+            if version in done:
+                continue
+            
+            logging.info(f'Applying migration {version}: {name}')
+            upgrade()
+            try:
+                db.session.execute(schema_migrations.insert().values(
+                    version=version, name=name, applied_at=datetime.utcnow()))
+                db.session.commit()
+            except IntegrityError:
+                # Another process finished the same (idempotent) migration first
+                db.session.rollback()
+            applied.append(name)
+        return applied
+    finally:
+        if lock is not None:
+            lock.rollback()
+            lock.close()
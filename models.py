@@ -1,5 +1,7 @@
 from datetime import datetime
+from flask import g, has_app_context
 from app import db
+from sqlalchemy import func, select, update
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(db.Model):
@@ -13,7 +15,8 @@ class User(db.Model):
     password_hash = db.Column(db.String(256), nullable=False)
     bio = db.Column(db.Text, nullable=True)
     skills = db.Column(db.Text, nullable=True)
-    profile_image = db.Column(db.Text, nullable=True)  # Store base64 image or URL
+    profile_image = db.Column(db.Text, nullable=True)  # External URL (legacy rows may hold base64)
+    avatar_hash = db.Column(db.String(64), nullable=True)  # Uploaded avatar in the blob store
     phone = db.Column(db.String(20), nullable=True)
     location = db.Column(db.String(200), nullable=True)
     title = db.Column(db.String(200), nullable=True)
@@ -21,6 +24,7 @@ class User(db.Model):
     linkedin = db.Column(db.String(255), nullable=True)
     github = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)  # NULL until first edit on older rows
     
     # Relationships
     projects = db.relationship('Project', backref='owner', lazy=True, cascade='all, delete-orphan')
@@ -38,6 +42,27 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
+    def avatar_url(self, size='medium'):
+        if self.avatar_hash:
+            return f'/avatars/{self.avatar_hash}/{size}'
+        return self.profile_image
+    
+    def to_summary(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'full_name': self.full_name,
+            'profile_image': self.avatar_url('small')
+        }
+    
+    def to_directory_entry(self):
+        """Public fields shown when browsing or searching people (no contact details)"""
+        return dict(self.to_summary(),
+                    college=self.college,
+                    title=self.title,
+                    skills=self.skills,
+                    location=self.location)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -47,7 +72,7 @@ class User(db.Model):
             'college': self.college,
             'bio': self.bio,
             'skills': self.skills,
-            'profile_image': self.profile_image,
+            'profile_image': self.avatar_url(),
             'phone': self.phone,
             'location': self.location,
             'title': self.title,
@@ -57,6 +82,18 @@ class User(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+def user_summary(user):
+    """Compact user representation for embedding in other resources, built once per request per user"""
+    if user is None:
+        return None
+    if not has_app_context():
+        return user.to_summary()
+    
+    summaries = g.setdefault('user_summaries', {})
+    if user.id not in summaries:
+        summaries[user.id] = user.to_summary()
+    return summaries[user.id]
+
 class Project(db.Model):
     __tablename__ = 'projects'
     
@@ -67,11 +104,15 @@ class Project(db.Model):
     funding_goal = db.Column(db.Float, default=0.0)
     current_funding = db.Column(db.Float, default=0.0)
     status = db.Column(db.String(50), default='active')  # active, completed, paused
+    vote_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    collaboration_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    hot_score = db.Column(db.Float, nullable=False, default=0, server_default='0', index=True)  # see ranking.py
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Foreign Keys
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     
     # Relationships
     comments = db.relationship('Comment', backref='project', lazy=True, cascade='all, delete-orphan')
@@ -80,20 +121,27 @@ class Project(db.Model):
     donations = db.relationship('Donation', backref='project', lazy=True, cascade='all, delete-orphan')
     attachments = db.relationship('ProjectAttachment', backref='project', lazy=True, cascade='all, delete-orphan')
     
+    # Browse listings page by (sort key, id)
+    __table_args__ = (db.Index('ix_projects_created_at_id', 'created_at', 'id'),
+                      db.Index('ix_projects_category_created_at_id', 'category', 'created_at', 'id'))
+    
     def get_vote_count(self):
-        return Vote.query.filter_by(project_id=self.id, is_upvote=True).count()
+        return self.vote_count or 0
     
     def get_collaboration_count(self):
-        return Collaboration.query.filter_by(project_id=self.id).count()
+        return self.collaboration_count or 0
     
     def get_comment_count(self):
-        return Comment.query.filter_by(project_id=self.id).count()
-    
-    def to_dict(self, current_user_id=None):
-        owner_data = None
-        if hasattr(self, 'owner') and self.owner:
-            owner_data = self.owner.to_dict()
+        return self.comment_count or 0
+    
+    def to_dict(self, current_user_id=None, prefetched=None):
+        if prefetched is None:
+            prefetched = {
+                'owner': self.owner if hasattr(self, 'owner') else None,
+                'attachments': self.attachments if hasattr(self, 'attachments') else []
+            }
         
+        owner = prefetched['owner']
         return {
             'id': self.id,
             'title': self.title,
@@ -104,13 +152,37 @@ class Project(db.Model):
             'status': self.status,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'owner': owner_data,
+            'owner': user_summary(owner),
             'vote_count': self.get_vote_count(),
             'collaboration_count': self.get_collaboration_count(),
             'comment_count': self.get_comment_count(),
-            'attachments': [attachment.to_dict() for attachment in self.attachments] if hasattr(self, 'attachments') else [],
+            'attachments': [attachment.to_dict() for attachment in prefetched['attachments']],
             'can_edit': current_user_id == self.user_id if current_user_id else False
         }
+    
+    @staticmethod
+    def bulk_to_dict(projects, current_user_id=None):
+        """Serialize a page of projects, loading owners and attachments in one query each"""
+        if not projects:
+            return []
+        
+        project_ids = [project.id for project in projects]
+        owner_ids = {project.user_id for project in projects}
+        
+        owners = {user.id: user for user in User.query.filter(User.id.in_(owner_ids)).all()}
+        
+        attachments = {}
+        for attachment in ProjectAttachment.query.filter(ProjectAttachment.project_id.in_(project_ids))\
+                                                 .order_by(ProjectAttachment.id).all():
+            attachments.setdefault(attachment.project_id, []).append(attachment)
+        
+        return [
+            project.to_dict(current_user_id, prefetched={
+                'owner': owners.get(project.user_id),
+                'attachments': attachments.get(project.id, [])
+            })
+            for project in projects
+        ]
 
 class Comment(db.Model):
     __tablename__ = 'comments'
@@ -124,6 +196,9 @@ class Comment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
     
+    __table_args__ = (db.Index('ix_comments_project_id_created_at', 'project_id', 'created_at'),
+                      db.Index('ix_comments_user_id_created_at', 'user_id', 'created_at'))
+    
     def get_reaction_count(self, reaction_type):
         """Get count of reactions of specific type for this comment"""
         return len([r for r in self.reactions if r.reaction_type == reaction_type])
@@ -138,7 +213,7 @@ class Comment(db.Model):
     def to_dict(self, user_id=None):
         author_data = None
         if hasattr(self, 'author') and self.author:
-            author_data = self.author.to_dict()
+            author_data = user_summary(self.author)
             
         result = {
             'id': self.id,
@@ -169,7 +244,8 @@ class Vote(db.Model):
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
     
     # Ensure one vote per user per project
-    __table_args__ = (db.UniqueConstraint('user_id', 'project_id', name='unique_user_project_vote'),)
+    __table_args__ = (db.UniqueConstraint('user_id', 'project_id', name='unique_user_project_vote'),
+                      db.Index('ix_votes_project_id_is_upvote', 'project_id', 'is_upvote'))
 
 class Collaboration(db.Model):
     __tablename__ = 'collaborations'
@@ -184,12 +260,13 @@ class Collaboration(db.Model):
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
     
     # Ensure one collaboration request per user per project
-    __table_args__ = (db.UniqueConstraint('user_id', 'project_id', name='unique_user_project_collab'),)
+    __table_args__ = (db.UniqueConstraint('user_id', 'project_id', name='unique_user_project_collab'),
+                      db.Index('ix_collaborations_project_id_status', 'project_id', 'status'))
     
     def to_dict(self):
         collaborator_data = None
         if hasattr(self, 'collaborator') and self.collaborator:
-            collaborator_data = self.collaborator.to_dict()
+            collaborator_data = user_summary(self.collaborator)
             
         return {
             'id': self.id,
@@ -211,10 +288,12 @@ class Donation(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
     
+    __table_args__ = (db.Index('ix_donations_user_id_created_at', 'user_id', 'created_at'),)
+    
     def to_dict(self):
         donor_data = None
         if hasattr(self, 'donor') and self.donor:
-            donor_data = self.donor.to_dict()
+            donor_data = user_summary(self.donor)
             
         return {
             'id': self.id,
@@ -235,6 +314,9 @@ class Discussion(db.Model):
     media_type = db.Column(db.String(20), nullable=True)  # 'image', 'video', or None
     media_url = db.Column(db.Text, nullable=True)  # Store base64 data or URL
     media_filename = db.Column(db.String(255), nullable=True)  # Original filename
+    media_id = db.Column(db.Integer, db.ForeignKey('media_assets.id'), nullable=True)  # Uploaded media
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -245,20 +327,31 @@ class Discussion(db.Model):
     replies = db.relationship('DiscussionReply', backref='discussion', lazy=True, cascade='all, delete-orphan')
     likes = db.relationship('DiscussionLike', backref='discussion', lazy=True, cascade='all, delete-orphan')
     
+    # Browse listings page by (sort key, id)
+    __table_args__ = (db.Index('ix_discussions_created_at_id', 'created_at', 'id'),
+                      db.Index('ix_discussions_category_created_at_id', 'category', 'created_at', 'id'))
+    
     def get_like_count(self):
-        return DiscussionLike.query.filter_by(discussion_id=self.id).count()
+        return self.like_count or 0
     
     def get_reply_count(self):
-        return DiscussionReply.query.filter_by(discussion_id=self.id).count()
+        return self.reply_count or 0
     
     def is_liked_by_user(self, user_id):
         return DiscussionLike.query.filter_by(discussion_id=self.id, user_id=user_id).first() is not None
     
-    def to_dict(self, current_user_id=None):
+    def to_dict(self, current_user_id=None, prefetched=None):
+        if prefetched is None:
+            prefetched = {
+                'author': self.author if hasattr(self, 'author') else None,
+                'is_liked': self.is_liked_by_user(current_user_id) if current_user_id else False
+            }
+        
         tags_list = [tag.strip() for tag in self.tags.split(',')] if self.tags else []
-        author_data = None
-        if hasattr(self, 'author') and self.author:
-            author_data = self.author.to_dict()
+        author = prefetched['author']
+        author_data = user_summary(author)
+        like_count = self.get_like_count()
+        reply_count = self.get_reply_count()
             
         return {
             'id': self.id,
@@ -267,18 +360,42 @@ class Discussion(db.Model):
             'category': self.category,
             'tags': tags_list,
             'media_type': self.media_type,
-            'media_url': self.media_url,
+            'media_url': f'/media/{self.media_id}' if self.media_id else self.media_url,
             'media_filename': self.media_filename,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'author': author_data,
-            'like_count': self.get_like_count(),
-            'reply_count': self.get_reply_count(),
-            'is_liked': self.is_liked_by_user(current_user_id) if current_user_id else False,
-            'likes': self.get_like_count(),
-            'replies': self.get_reply_count(),
+            'like_count': like_count,
+            'reply_count': reply_count,
+            'is_liked': prefetched['is_liked'],
+            'likes': like_count,
+            'replies': reply_count,
             'can_edit': current_user_id == self.user_id if current_user_id else False
         }
+    
+    @staticmethod
+    def bulk_to_dict(discussions, current_user_id=None):
+        """Serialize a page of discussions with authors and the user's liked-set loaded in one query each"""
+        if not discussions:
+            return []
+        
+        author_ids = {discussion.user_id for discussion in discussions}
+        authors = {user.id: user for user in User.query.filter(User.id.in_(author_ids)).all()}
+        
+        liked_ids = set()
+        if current_user_id:
+            liked_ids = {discussion_id for (discussion_id,) in db.session.query(DiscussionLike.discussion_id)
+                         .filter(DiscussionLike.user_id == current_user_id,
+                                 DiscussionLike.discussion_id.in_([discussion.id for discussion in discussions]))
+                         .all()}
+        
+        return [
+            discussion.to_dict(current_user_id, prefetched={
+                'author': authors.get(discussion.user_id),
+                'is_liked': discussion.id in liked_ids
+            })
+            for discussion in discussions
+        ]
 
 class DiscussionReply(db.Model):
     __tablename__ = 'discussion_replies'
@@ -297,40 +414,51 @@ class DiscussionReply(db.Model):
     reactions = db.relationship('ReplyReaction', backref='reply', lazy=True, cascade='all, delete-orphan')
     nested_replies = db.relationship('DiscussionReply', backref=db.backref('parent_reply', remote_side=[id]), lazy=True)
     
+    __table_args__ = (db.Index('ix_discussion_replies_discussion_id_parent_reply_id', 'discussion_id', 'parent_reply_id'),
+                      db.Index('ix_discussion_replies_created_at', 'created_at'))
+    
     def get_reaction_count(self, reaction_type):
         return ReplyReaction.query.filter_by(reply_id=self.id, reaction_type=reaction_type).count()
     
     def is_reacted_by_user(self, user_id, reaction_type):
         return ReplyReaction.query.filter_by(reply_id=self.id, user_id=user_id, reaction_type=reaction_type).first() is not None
     
-    def to_dict(self, current_user_id=None):
-        author_data = None
-        if hasattr(self, 'author') and self.author:
-            author_data = self.author.to_dict()
-            
-        # Handle nested replies safely
-        nested_replies_list = []
-        try:
-            if hasattr(self, 'nested_replies') and self.nested_replies:
-                nested_replies_list = [nested.to_dict(current_user_id) for nested in self.nested_replies]
-        except Exception:
+    def to_dict(self, current_user_id=None, prefetched=None):
+        if prefetched is None:
+            # Handle nested replies safely
             nested_replies_list = []
+            try:
+                if hasattr(self, 'nested_replies') and self.nested_replies:
+                    nested_replies_list = [nested.to_dict(current_user_id) for nested in self.nested_replies]
+            except Exception:
+                nested_replies_list = []
             
+            prefetched = {
+                'author': self.author if hasattr(self, 'author') else None,
+                'likes': self.get_reaction_count('like'),
+                'hearts': self.get_reaction_count('heart'),
+                'user_reactions': {
+                    'like': self.is_reacted_by_user(current_user_id, 'like'),
+                    'heart': self.is_reacted_by_user(current_user_id, 'heart'),
+                } if current_user_id else {},
+                'nested_replies': nested_replies_list,
+                'more_replies': 0
+            }
+        
+        author = prefetched['author']
         return {
             'id': self.id,
             'content': self.content,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat() if hasattr(self, 'updated_at') and self.updated_at else self.created_at.isoformat(),
-            'author': author_data,
-            'likes': self.get_reaction_count('like'),
-            'hearts': self.get_reaction_count('heart'),
+            'author': user_summary(author),
+            'likes': prefetched['likes'],
+            'hearts': prefetched['hearts'],
             'parent_reply_id': self.parent_reply_id,
-            'nested_replies': nested_replies_list,
+            'nested_replies': prefetched['nested_replies'],
+            'more_replies': prefetched['more_replies'],
             'can_edit': current_user_id == self.user_id if current_user_id else False,
-            'user_reactions': {
-                'like': self.is_reacted_by_user(current_user_id, 'like') if current_user_id else False,
-                'heart': self.is_reacted_by_user(current_user_id, 'heart') if current_user_id else False,
-            } if current_user_id else {}
+            'user_reactions': prefetched['user_reactions']
         }
 
 class DiscussionLike(db.Model):
@@ -344,7 +472,8 @@ class DiscussionLike(db.Model):
     discussion_id = db.Column(db.Integer, db.ForeignKey('discussions.id'), nullable=False)
     
     # Ensure one like per user per discussion
-    __table_args__ = (db.UniqueConstraint('user_id', 'discussion_id', name='unique_user_discussion_like'),)
+    __table_args__ = (db.UniqueConstraint('user_id', 'discussion_id', name='unique_user_discussion_like'),
+                      db.Index('ix_discussion_likes_created_at', 'created_at'))
 
 class ReplyReaction(db.Model):
     __tablename__ = 'reply_reactions'
@@ -378,9 +507,18 @@ class Notification(db.Model):
     # Relationships
     recipient = db.relationship('User', foreign_keys=[user_id], backref='received_notifications')
     actor = db.relationship('User', foreign_keys=[related_user_id], backref='sent_notifications')
+    
+    __table_args__ = (db.Index('ix_notifications_user_id_is_read_created_at', 'user_id', 'is_read', 'created_at'),)
     related_project = db.relationship('Project', backref='notifications')
     
-    def to_dict(self):
+    def to_dict(self, prefetched=None):
+        if prefetched is None:
+            project = self.related_project
+            prefetched = {
+                'actor': self.actor,
+                'project': {'id': project.id, 'title': project.title} if project else None
+            }
+        
         return {
             'id': self.id,
             'type': self.type,
@@ -388,9 +526,35 @@ class Notification(db.Model):
             'message': self.message,
             'is_read': self.is_read,
             'created_at': self.created_at.isoformat(),
-            'actor': self.actor.to_dict() if self.actor else None,
-            'project': self.related_project.to_dict() if self.related_project else None
+            'actor': user_summary(prefetched['actor']),
+            'project': prefetched['project']
         }
+    
+    @staticmethod
+    def bulk_to_dict(notifications):
+        """Serialize a feed page, loading actors and project titles in one query each"""
+        if not notifications:
+            return []
+        
+        actor_ids = {n.related_user_id for n in notifications if n.related_user_id}
+        project_ids = {n.project_id for n in notifications if n.project_id}
+        
+        actors = {}
+        if actor_ids:
+            actors = {user.id: user for user in User.query.filter(User.id.in_(actor_ids)).all()}
+        projects = {}
+        if project_ids:
+            projects = {project_id: {'id': project_id, 'title': title}
+                        for project_id, title in db.session.query(Project.id, Project.title)
+                                                           .filter(Project.id.in_(project_ids)).all()}
+        
+        return [
+            n.to_dict(prefetched={
+                'actor': actors.get(n.related_user_id),
+                'project': projects.get(n.project_id)
+            })
+            for n in notifications
+        ]
 
 class CommentReaction(db.Model):
     __tablename__ = 'comment_reactions'
@@ -401,7 +565,7 @@ class CommentReaction(db.Model):
     
     # Foreign Keys
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    comment_id = db.Column(db.Integer, db.ForeignKey('comments.id'), nullable=False)
+    comment_id = db.Column(db.Integer, db.ForeignKey('comments.id'), nullable=False, index=True)
     
     # Relationships
     user = db.relationship('User', backref='comment_reactions')
@@ -428,7 +592,7 @@ class CommentReply(db.Model):
     def to_dict(self):
         author_data = None
         if hasattr(self, 'author') and self.author:
-            author_data = self.author.to_dict()
+            author_data = user_summary(self.author)
             
         return {
             'id': self.id,
@@ -451,7 +615,7 @@ class ProjectAttachment(db.Model):
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Foreign Keys
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
     def to_dict(self):
@@ -466,6 +630,33 @@ class ProjectAttachment(db.Model):
         }
 
 
+# Uploaded discussion media, stored on disk by content hash
+class MediaAsset(db.Model):
+    __tablename__ = 'media_assets'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    media_type = db.Column(db.String(20), nullable=False)  # 'image' or 'video'
+    mime_type = db.Column(db.String(100), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    file_size = db.Column(db.Integer, nullable=False)  # Size in bytes
+    sha256 = db.Column(db.String(64), nullable=False)  # Blob store key
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Foreign Keys
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'url': f'/media/{self.id}',
+            'media_type': self.media_type,
+            'mime_type': self.mime_type,
+            'original_filename': self.original_filename,
+            'file_size': self.file_size,
+            'created_at': self.created_at.isoformat()
+        }
+
+
 class TeamChat(db.Model):
     __tablename__ = 'team_chats'
     
@@ -481,10 +672,68 @@ class TeamChat(db.Model):
     project = db.relationship('Project', backref='chat_messages')
     author = db.relationship('User', backref='chat_messages')
     
-    def to_dict(self):
+    # History is paged by ID within a project
+    __table_args__ = (db.Index('ix_team_chats_project_id_id', 'project_id', 'id'),)
+    
+    def to_dict(self, prefetched=None):
+        if prefetched is None:
+            prefetched = {'author': self.author}
+        
         return {
             'id': self.id,
+            'project_id': self.project_id,
             'message': self.message,
             'created_at': self.created_at.isoformat(),
-            'author': self.author.to_dict() if hasattr(self, 'author') and self.author else None
+            'author': user_summary(prefetched['author']) if prefetched['author'] else None
         }
+    
+    @staticmethod
+    def bulk_to_dict(messages):
+        """Serialize a page of chat messages, loading authors in one query"""
+        if not messages:
+            return []
+        
+        author_ids = {message.user_id for message in messages}
+        authors = {user.id: user for user in User.query.filter(User.id.in_(author_ids)).all()}
+        
+        return [message.to_dict(prefetched={'author': authors.get(message.user_id)}) for message in messages]
+
+
+
+def adjust_counter(model, row_id, column, delta):
+    """Atomically shift a denormalized counter as part of the caller's transaction"""
+    counter = getattr(model, column)
+    model.query.filter(model.id == row_id).update({
+        counter: counter + delta,
+        model.updated_at: model.updated_at  # counters are not content edits
+    })
+
+
+def reconcile_counters():
+    """Recompute every denormalized counter from its source table and repair rows that drifted"""
+    counters = [
+        (Project, 'vote_count', select(func.count(Vote.id))
+            .where(Vote.project_id == Project.id, Vote.is_upvote == True)),
+        (Project, 'comment_count', select(func.count(Comment.id))
+            .where(Comment.project_id == Project.id)),
+        (Project, 'collaboration_count', select(func.count(Collaboration.id))
+            .where(Collaboration.project_id == Project.id)),
+        (Discussion, 'like_count', select(func.count(DiscussionLike.id))
+            .where(DiscussionLike.discussion_id == Discussion.id)),
+        (Discussion, 'reply_count', select(func.count(DiscussionReply.id))
+            .where(DiscussionReply.discussion_id == Discussion.id)),
+    ]
+    
+    repaired = {}
+    for model, column, source in counters:
+        actual = source.scalar_subquery()
+        result = db.session.execute(
+            update(model)
+            .where(getattr(model, column) != actual)
+            .values({column: actual, 'updated_at': model.updated_at})
+            .execution_options(synchronize_session=False)
+        )
+        repaired[f'{model.__tablename__}.{column}'] = result.rowcount
+    
+    db.session.commit()
+    return repaired
@@ -0,0 +1,94 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event, insert
+from app import app, db
+from models import Notification, Project, User, user_summary
+from metrics import registry
+from pubsub import hub
+
+# Large fan-outs are written here after the triggering transaction commits
+_executor = ThreadPoolExecutor(max_workers=app.config['NOTIFY_WORKERS'], thread_name_prefix='notify')
+
+
+def notify(recipient_ids, type, title, message, related_user_id=None, project_id=None):
+    """Queue one notification per recipient as part of the caller's transaction.
+
+    Up to NOTIFY_DEFER_THRESHOLD recipients are inserted with a single bulk
+    INSERT that commits or rolls back with the caller. Larger fan-outs are
+    handed to a background worker once the caller's transaction commits, so the
+    request path does not pay for them. Nothing is committed here; recipients
+    connected to the notification stream are pushed the new item after commit.
+    """
+    recipient_ids = list(dict.fromkeys(recipient_ids))
+    if not recipient_ids:
+        return
+    
+    created_at = datetime.utcnow()
+    rows = [{
+        'user_id': recipient_id,
+        'type': type,
+        'title': title,
+        'message': message,
+        'is_read': False,
+        'related_user_id': related_user_id,
+        'project_id': project_id,
+        'created_at': created_at
+    } for recipient_id in recipient_ids]
+    
+    # Usually already in the session's identity map, so these rarely hit the database
+    actor = db.session.get(User, related_user_id) if related_user_id else None
+    project = db.session.get(Project, project_id) if project_id else None
+    template = {
+        'type': type,
+        'title': title,
+        'message': message,
+        'is_read': False,
+        'created_at': created_at.isoformat(),
+        'actor': user_summary(actor),
+        'project': {'id': project.id, 'title': project.title} if project else None
+    }
+    
+    if len(rows) > current_app.config['NOTIFY_DEFER_THRESHOLD']:
+        registry.observe('notification_fanout_recipients', len(rows), {'delivery': 'deferred'})
+        db.session.info.setdefault('deferred_notifications', []).append((rows, template))
+    else:
+        registry.observe('notification_fanout_recipients', len(rows), {'delivery': 'inline'})
+        _insert(rows, template)
+
+
+def _insert(rows, template):
+    ids = db.session.scalars(
+        insert(Notification).returning(Notification.id, sort_by_parameter_order=True), rows
+    ).all()
+    pending = db.session.info.setdefault('published_notifications', [])
+    for row, notification_id in zip(rows, ids):
+        pending.append((row['user_id'], dict(template, id=notification_id)))
+
+
+def _write_deferred(flask_app, batches):
+    with flask_app.app_context():
+        try:
+            for rows, template in batches:
+                _insert(rows, template)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logging.exception('Deferred notification fan-out failed')
+
+
+@event.listens_for(db.session, 'after_commit')
+def _dispatch_after_commit(session):
+    for user_id, item in session.info.pop('published_notifications', ()):
+        hub.publish(f'user:{user_id}', {'type': 'notification', 'notification': item})
+    
+    batches = session.info.pop('deferred_notifications', None)
+    if batches:
+        _executor.submit(_write_deferred, current_app._get_current_object(), batches)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('published_notifications', None)
+    session.info.pop('deferred_notifications', None)
@@ -0,0 +1,117 @@
+import base64
+import binascii
+import json
+import math
+from datetime import datetime
+from flask import current_app, request
+from sqlalchemy import and_, func, or_
+from app import db
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(values, sort_keys):
+    """Pack a row's sort key values, tagged with the sort key names, into an opaque URL-safe token"""
+    payload = {'k': [column.key for column, _ in sort_keys],
+               'v': [value.isoformat() if isinstance(value, datetime) else value for value in values]}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def _cursor_value(column, value):
+    """`value` as a bound parameter for `column`, or InvalidCursor when it cannot be one"""
+    if isinstance(column.type, db.DateTime):
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise InvalidCursor('Invalid cursor')
+    # bool is an int to Python but never a valid sort value
+    if isinstance(value, bool) or value is None:
+        raise InvalidCursor('Invalid cursor')
+    if isinstance(column.type, db.Integer):
+        valid = isinstance(value, int)
+    elif isinstance(column.type, db.Numeric):  # Float included
+        valid = isinstance(value, (int, float)) and math.isfinite(value)
+    else:
+        valid = isinstance(value, str)
+    if not valid:
+        raise InvalidCursor('Invalid cursor')
+    return value
+
+
+def decode_cursor(token, sort_keys):
+    """Unpack a cursor token into values matching the given sort keys.
+    
+    Raises InvalidCursor for a malformed token, one issued for a different
+    sort order, or a value whose type does not fit its column.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor('Invalid cursor')
+    
+    if not isinstance(payload, dict) or payload.get('k') != [column.key for column, _ in sort_keys]:
+        raise InvalidCursor('Invalid cursor')
+    values = payload.get('v')
+    if not isinstance(values, list) or len(values) != len(sort_keys):
+        raise InvalidCursor('Invalid cursor')
+    
+    return [_cursor_value(column, value) for (column, _), value in zip(sort_keys, values)]
+
+
+def page_size(default):
+    """Read per_page from the request, clamped to the configured maximum"""
+    per_page = request.args.get('per_page', default, type=int)
+    return min(max(per_page, 1), current_app.config['MAX_PAGE_SIZE'])
+
+
+def _after(sort_keys, values):
+    """WHERE clause selecting rows that sort strictly after the cursor row"""
+    clauses = []
+    for position, (column, descending) in enumerate(sort_keys):
+        equal_prefix = [sort_keys[i][0] == values[i] for i in range(position)]
+        beyond = column < values[position] if descending else column > values[position]
+        clauses.append(and_(*equal_prefix, beyond))
+    return or_(*clauses)
+
+
+def keyset_page(query, sort_keys, cursor, per_page, offset=0):
+    """Fetch one page of `query` ordered by `sort_keys` without OFFSET.
+    
+    `sort_keys` is a list of (model column, descending) pairs whose last entry
+    is the primary key so the order is total; the columns must be non-null.
+    Returns the rows and the cursor for the next page, or None on the last page.
+    `offset` only serves deprecated page-number requests that have no cursor.
+    """
+    if cursor:
+        query = query.filter(_after(sort_keys, decode_cursor(cursor, sort_keys)))
+    
+    ordering = [column.desc() if descending else column.asc() for column, descending in sort_keys]
+    rows = query.order_by(*ordering).offset(offset or None).limit(per_page + 1).all()
+    
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column, _ in sort_keys], sort_keys)
+    return rows, next_cursor
+
+
+def count_total(query, mode):
+    """Total for a paged listing: exact, a bounded estimate, or None when omitted.
+    
+    Returns (total, is_estimate). An estimate counts at most TOTAL_ESTIMATE_CAP
+    rows, so deep listings report the cap instead of scanning everything.
+    """
+    if mode == 'none':
+        return None, False
+    
+    query = query.order_by(None)
+    if mode == 'estimate':
+        cap = current_app.config['TOTAL_ESTIMATE_CAP']
+        bounded = query.limit(cap + 1).subquery()
+        total = db.session.query(func.count()).select_from(bounded).scalar()
+        return min(total, cap), total > cap
+    
+    return query.count(), False
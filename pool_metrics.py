@@ -0,0 +1,64 @@
+import logging
+import os
+import threading
+import time
+from sqlalchemy import event
+
+# Cumulative pool events for this worker, keyed by engine
+_counters = {}
+_lock = threading.Lock()
+
+
+def _count(engine, name):
+    with _lock:
+        _counters[engine][name] += 1
+
+
+def track_pool(engine):
+    """Count new connections, checkouts and invalidated connections on `engine`'s pool"""
+    if engine in _counters:
+        return
+    _counters[engine] = {'connects': 0, 'checkouts': 0, 'invalidations': 0}
+    event.listen(engine, 'connect', lambda dbapi_connection, record: _count(engine, 'connects'))
+    event.listen(engine, 'checkout', lambda dbapi_connection, record, proxy: _count(engine, 'checkouts'))
+    event.listen(engine, 'invalidate', lambda dbapi_connection, record, exception: _count(engine, 'invalidations'))
+
+
+def pool_status(engine):
+    """This worker's pool usage: checked out, idle and overflow connections plus event totals.
+    
+    Size figures are None for pools without a fixed-size queue, such as
+    SQLite's in-memory pool.
+    """
+    pool = engine.pool
+    status = {
+        'pid': os.getpid(),
+        'pool': type(pool).__name__,
+        'size': None,
+        'checked_out': None,
+        'idle': None,
+        'overflow': None,
+    }
+    if hasattr(pool, 'checkedout'):
+        status.update(size=pool.size(), checked_out=pool.checkedout(), idle=pool.checkedin(),
+                      overflow=max(pool.overflow(), 0))
+    with _lock:
+        status.update(_counters.get(engine, {}))
+    return status
+
+
+def start_pool_logger(flask_app, engine):
+    """Log pool_status every DB_POOL_LOG_SECONDS in a daemon thread (disabled when 0)"""
+    interval = flask_app.config['DB_POOL_LOG_SECONDS']
+    if interval <= 0:
+        return None
+    
+    def run():
+        while True:
+            time.sleep(interval)
+            status = pool_status(engine)
+            logging.info('db pool ' + ' '.join(f'{key}={value}' for key, value in status.items()))
+    
+    thread = threading.Thread(target=run, name='pool-metrics', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from app import app
+
+
+class Subscription:
+    """A subscriber's bounded event buffer, fed by one or more channels.
+
+    publish() never blocks: when a slow consumer lets the buffer fill up, the
+    buffered events are dropped and the subscription is flagged as overflowed
+    so the consumer can resynchronize from the database instead.
+    """
+    
+    def __init__(self, channels, maxsize):
+        self.channels = channels
+        self.maxsize = maxsize
+        self.overflowed = False
+        self._events = deque()
+        self._condition = threading.Condition()
+    
+    def put(self, event):
+        with self._condition:
+            if len(self._events) >= self.maxsize:
+                self._events.clear()
+                self.overflowed = True
+            self._events.append(event)
+            self._condition.notify()
+    
+    def get(self, timeout):
+        """Wait up to timeout seconds and return all buffered events (possibly none)"""
+        with self._condition:
+            if not self._events:
+                self._condition.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+    
+    def take_overflow(self):
+        with self._condition:
+            overflowed, self.overflowed = self.overflowed, False
+            return overflowed
+
+
+class MemoryHub:
+    """In-process publish/subscribe hub; only reaches subscribers in the same worker"""
+    
+    def __init__(self, buffer_size):
+        self.buffer_size = buffer_size
+        self._channels = {}
+        self._lock = threading.Lock()
+    
+    def subscribe(self, *channels, maxsize=None):
+        subscription = Subscription(channels, maxsize or self.buffer_size)
+        with self._lock:
+            for channel in channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+    
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._channels.get(channel, ()))
+    
+    def publish(self, channel, event):
+        self._deliver(channel, event)
+    
+    def _deliver(self, channel, event):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+
+class SQLiteHub(MemoryHub):
+    """Local stand-in broker for multi-worker deployments.
+
+    Events are appended to a shared SQLite file and every worker process tails
+    it from a background thread, delivering to its own subscribers. Only
+    suitable for workers on a single host.
+    """
+    
+    def __init__(self, buffer_size, path, poll_interval=0.2, retention_seconds=60):
+        super().__init__(buffer_size)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+        
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS events ('
+                               'id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, '
+                               'payload TEXT NOT NULL, created_at REAL NOT NULL)')
+            self._last_id = connection.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+        
+        threading.Thread(target=self._tail, name='pubsub-tail', daemon=True).start()
+    
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+    
+    def publish(self, channel, event):
+        now = time.time()
+        connection = self._connect()
+        connection.execute('INSERT INTO events (channel, payload, created_at) VALUES (?, ?, ?)',
+                           (channel, json.dumps(event), now))
+        connection.execute('DELETE FROM events WHERE created_at < ?', (now - self.retention_seconds,))
+    
+    def _tail(self):
+        while True:
+            try:
+                rows = self._connect().execute('SELECT id, channel, payload FROM events WHERE id > ? ORDER BY id',
+                                               (self._last_id,)).fetchall()
+                for event_id, channel, payload in rows:
+                    self._last_id = event_id
+                    self._deliver(channel, json.loads(payload))
+            except sqlite3.Error:
+                logging.exception('Pub/sub broker poll failed')
+            time.sleep(self.poll_interval)
+
+
+class StreamSlots:
+    """Caps the event streams one process serves at once.
+    
+    Every open stream pins a server thread for up to SSE_MAX_SECONDS, so only
+    a small share of the thread pool may stream; a client refused a slot
+    polls instead.
+    """
+    
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        with self._lock:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+    
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+
+def create_hub(config):
+    if config['PUBSUB_BACKEND'] == 'sqlite':
+        return SQLiteHub(config['PUBSUB_BUFFER_SIZE'], config['PUBSUB_SQLITE_PATH'])
+    return MemoryHub(config['PUBSUB_BUFFER_SIZE'])
+
+
+hub = create_hub(app.config)
+stream_slots = StreamSlots(app.config['SSE_MAX_STREAMS'])
+
+
+def format_sse(event, data, event_id=None):
+    prefix = f'id: {event_id}\n' if event_id is not None else ''
+    return f'{prefix}event: {event}\ndata: {json.dumps(data)}\n\n'
@@ -0,0 +1,137 @@
+import re
+from sqlalchemy import event
+from app import app, db
+from seed import SEED_PASSWORD, sample_ids, seed_dataset, seed_volumes
+
+# GET endpoints whose queries are checked; {project}, {discussion} and {user} are seeded ids
+ENDPOINTS = [
+    '/api/user',
+    '/api/projects',
+    '/api/projects?sort=popular',
+    '/api/projects?sort=hot',
+    '/api/projects?category=Technology&total=exact',
+    '/api/projects/{project}',
+    '/api/projects/{project}/comments',
+    '/api/projects/{project}/chat',
+    '/api/projects/{project}/participants',
+    '/api/dashboard/stats',
+    '/api/dashboard/user-collaborations',
+    '/api/dashboard/user-donations',
+    '/api/dashboard/user-activity',
+    '/api/discussions',
+    '/api/discussions?sort=popular',
+    '/api/discussions?category=General&total=exact',
+    '/api/discussions?search=solar',
+    '/api/discussions/trending',
+    '/api/discussions/{discussion}',
+    '/api/discussions/{discussion}/replies',
+    '/api/discussions/{discussion}/comments',
+    '/api/discussions/stats',
+    '/api/users',
+    '/api/users?search=user1',
+    '/api/users?search=us&typeahead=1',
+    '/api/users/{user}/profile',
+    '/api/collaborations',
+    '/api/notifications',
+    '/api/notifications/count',
+    '/api/user/team',
+    '/api/homepage/stats',
+    '/api/stats',
+]
+
+# (table, statement fragment) pairs where a full scan is expected despite a WHERE clause
+ALLOWED_SCANS = []
+
+# Fraction of the benchmark volumes seeded: seconds to load, yet large enough that indexes win
+PLAN_SCALE = 0.002
+
+
+def seed_plan_dataset(scale=1):
+    """Seed an empty database at PLAN_SCALE (times `scale`) and return the ids to request pages with"""
+    seed_dataset(seed_volumes(PLAN_SCALE * scale))
+    return sample_ids()
+
+
+def capture_endpoint_queries(ids):
+    """Request every ENDPOINTS url as the seeded user; returns [(url, statement, parameters)]"""
+    captured = []
+    current = {}
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            captured.append((current['url'], statement, parameters))
+    
+    client = app.test_client()
+    response = client.post('/api/login', json={'username': ids['username'], 'password': SEED_PASSWORD})
+    if response.status_code != 200:
+        raise RuntimeError(f'Could not log in as {ids["username"]}: {response.status_code}')
+    
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        for template in ENDPOINTS:
+            current['url'] = template.format(**ids)
+            response = client.get(current['url'])
+            if response.status_code != 200:
+                raise RuntimeError(f'GET {current["url"]} returned {response.status_code}')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    return captured
+
+
+def sequential_scans(statement, parameters):
+    """Tables the database would read in full to answer `statement`"""
+    with db.engine.connect() as connection:
+        if connection.dialect.name == 'sqlite':
+            plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+            scans = []
+            for row in plan:
+                match = re.match(r'SCAN (\w+)(?: AS \w+)?$', row[-1])
+                # Subqueries and search tables are scanned by name too; only real tables count
+                if match and match.group(1) in db.metadata.tables:
+                    scans.append(match.group(1))
+            return scans
+        
+        if connection.dialect.name == 'postgresql':
+            # Only report sequential scans the planner cannot avoid, not ones it prefers on small tables
+            connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+            scans = []
+            nodes = [plan[0]['Plan']]
+            while nodes:
+                node = nodes.pop()
+                if node['Node Type'] == 'Seq Scan':
+                    scans.append(node['Relation Name'])
+                nodes.extend(node.get('Plans', []))
+            connection.rollback()
+            return scans
+    
+    raise RuntimeError(f'Query plans are not supported on {db.engine.dialect.name}')
+
+
+def _allowed(table, statement):
+    return any(table == allowed and pattern in statement for allowed, pattern in ALLOWED_SCANS)
+
+
+def check_query_plans(ids):
+    """EXPLAIN every query the API runs; returns [(url, table, statement)] for unindexed scans.
+    
+    Only filtered statements count: a scan without a WHERE clause reads the
+    whole table by design (platform-wide aggregates, for example).
+    """
+    regressions = []
+    seen = set()
+    for url, statement, parameters in capture_endpoint_queries(ids):
+        if statement in seen:
+            continue
+        seen.add(statement)
+        if not re.search(r'\bWHERE\b', statement, re.IGNORECASE):
+            continue
+        
+        for table in sequential_scans(statement, parameters):
+            if not _allowed(table, statement):
+                regressions.append((url, table, statement))
+    return regressions
+
+
+def describe_regression(url, table, statement):
+    return f'{url}: full scan of {table}\n    {" ".join(statement.split())}'
@@ -0,0 +1,100 @@
+import json
+import logging
+import re
+import time
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+
+def statement_shape(statement):
+    """Normalize a statement so repeats with different parameters compare equal"""
+    shape = re.sub(r'\s+', ' ', statement).strip()
+    # Expanded IN lists vary in length with the number of ids
+    return re.sub(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,?)+\)', '(?)', shape)
+
+
+def _summary(statement):
+    # Column lists dominate ORM statements; the tables and filters are what identify them
+    return re.sub(r'^SELECT .*? FROM ', 'SELECT ... FROM ', ' '.join(statement.split()))[:500]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    if not has_request_context() or 'query_stats' not in g:
+        return
+    stats = g.query_stats
+    elapsed = time.perf_counter() - started
+    stats['count'] += 1
+    stats['seconds'] += elapsed
+    stats['statements'].append((elapsed, statement))
+    shape = statement_shape(statement)
+    stats['shapes'][shape] = stats['shapes'].get(shape, 0) + 1
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
+
+
+def _start_request():
+    g.query_stats = {'count': 0, 'seconds': 0.0, 'statements': [], 'shapes': {},
+                     'started': time.perf_counter()}
+
+
+def _finish_request(response):
+    # Left on g for the request metrics recorded at teardown
+    stats = g.get('query_stats')
+    if stats is None:
+        return response
+    
+    config = current_app.config
+    total_ms = (time.perf_counter() - stats['started']) * 1000
+    db_ms = stats['seconds'] * 1000
+    response.headers.add('Server-Timing', f'db;dur={db_ms:.1f};desc="{stats["count"]} queries"')
+    response.headers.add('Server-Timing', f'app;dur={total_ms:.1f}')
+    
+    # The same statement shape over and over usually means a lazy load per row (N+1)
+    threshold = config['QUERY_REPEAT_THRESHOLD']
+    repeated = {shape: count for shape, count in stats['shapes'].items() if threshold and count > threshold}
+    slowest = sorted(stats['statements'], key=lambda item: item[0], reverse=True)[:config['QUERY_SLOWEST_COUNT']]
+    
+    record = {
+        'event': 'request_queries',
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'queries': stats['count'],
+        'db_ms': round(db_ms, 1),
+        'total_ms': round(total_ms, 1),
+        'slowest': [{'ms': round(elapsed * 1000, 1), 'sql': _summary(statement)}
+                    for elapsed, statement in slowest],
+    }
+    if repeated:
+        record['repeated'] = [{'count': count, 'sql': _summary(shape)} for shape, count in repeated.items()]
+        logging.warning(json.dumps(record))
+    else:
+        logging.info(json.dumps(record))
+    return response
+
+
+def install_query_stats(flask_app, engine):
+    """Time every statement `engine` runs and report per-request totals.
+    
+    Each response gets Server-Timing entries for database and total time,
+    and a JSON log line with the query count and slowest statements. Requests
+    that repeat one statement shape more than QUERY_REPEAT_THRESHOLD times
+    are logged as warnings with the repeated shapes.
+    """
+    if not flask_app.config['QUERY_STATS_ENABLED']:
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+    flask_app.before_request(_start_request)
+    flask_app.after_request(_finish_request)
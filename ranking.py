@@ -0,0 +1,182 @@
+import fcntl
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from flask import current_app
+from sqlalchemy import bindparam, select, text, update
+from app import db
+from models import Project, adjust_counter
+
+
+def hot_scores(age_hours, votes, comments, funding, config):
+    """Vectorized hot score: weighted engagement divided by a power of age.
+    
+    Engagement is votes and comments plus the log of funding raised, so one
+    large donation cannot swamp community interest. The +2 hours keeps brand
+    new projects from dividing by zero.
+    """
+    engagement = (config['HOT_VOTE_WEIGHT'] * votes +
+                  config['HOT_COMMENT_WEIGHT'] * comments +
+                  config['HOT_DONATION_WEIGHT'] * np.log1p(np.maximum(funding, 0)))
+    return engagement / np.power(np.maximum(age_hours, 0) + 2, config['HOT_GRAVITY'])
+
+
+def bump_hot_score(project, votes=0, comments=0, donated=0.0):
+    """Add the score of a new interaction to `project` as part of the caller's transaction.
+    
+    The interaction is weighted by the project's current age, which is what a
+    full recompute would give it; the periodic recompute then re-applies decay
+    to everything at once. Pass negative counts when an interaction is undone.
+    `donated` is read against the project's already-updated current_funding.
+    """
+    config = current_app.config
+    engagement = config['HOT_VOTE_WEIGHT'] * votes + config['HOT_COMMENT_WEIGHT'] * comments
+    if donated:
+        funding = max(project.current_funding or 0, 0)
+        engagement += config['HOT_DONATION_WEIGHT'] * (math.log1p(funding) - math.log1p(max(funding - donated, 0)))
+    if not engagement:
+        return
+    
+    age_hours = (datetime.utcnow() - (project.created_at or datetime.utcnow())).total_seconds() / 3600
+    delta = engagement / (max(age_hours, 0) + 2) ** config['HOT_GRAVITY']
+    adjust_counter(Project, project.id, 'hot_score', delta)
+
+
+def recompute_hot_scores(batch_size=5000):
+    """Recompute every project's hot score in batches, writing only rows whose score moved.
+    
+    Each batch is read with one keyset query, scored with NumPy and written
+    back with a single executemany UPDATE, then committed. Returns the number
+    of rows rewritten.
+    """
+    table = Project.__table__
+    statement = update(table).where(table.c.id == bindparam('row_id'))\
+                             .values(hot_score=bindparam('score'), updated_at=table.c.updated_at)
+    
+    now = datetime.utcnow()
+    last_id = 0
+    written = 0
+    while True:
+        rows = db.session.execute(
+            select(Project.id, Project.created_at, Project.vote_count, Project.comment_count,
+                   Project.current_funding, Project.hot_score)
+            .where(Project.id > last_id).order_by(Project.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        
+        ids, created, votes, comments, funding, current = zip(*rows)
+        age_hours = np.array([((now - (c or now)).total_seconds()) for c in created]) / 3600
+        scores = hot_scores(age_hours,
+                            np.array(votes, dtype=float),
+                            np.array(comments, dtype=float),
+                            np.array([f or 0 for f in funding], dtype=float),
+                            current_app.config)
+        
+        # Old projects decay slowly; skip rewrites that would not move them meaningfully
+        current = np.array([s or 0 for s in current], dtype=float)
+        changed = np.flatnonzero(~np.isclose(scores, current, rtol=1e-3, atol=1e-9))
+        if len(changed):
+            db.session.execute(statement, [{'row_id': ids[i], 'score': float(scores[i])} for i in changed])
+        db.session.commit()
+        
+        written += len(changed)
+        last_id = ids[-1]
+    
+    return written
+
+
+# Arbitrary key, distinct from the migrations lock
+_ADVISORY_LOCK_KEY = 7141
+
+
+class RecomputeLeader:
+    """Elects the one process that runs the periodic recompute.
+    
+    The winner holds a Postgres session advisory lock on a dedicated
+    connection, or an exclusive lock on a file for other databases, for as
+    long as it lives. The others retry on every round, so one of them takes
+    over when the leader exits.
+    """
+    
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self._held = None
+    
+    def check(self):
+        """True while this process holds the lock, taking it when it is free"""
+        if db.engine.dialect.name == 'postgresql':
+            return self._check_postgres()
+        return self._check_file()
+    
+    def _check_postgres(self):
+        if self._held is not None:
+            try:
+                self._held.execute(text('SELECT 1'))
+                self._held.commit()
+                return True
+            except Exception:
+                # The lock went with the connection; compete again
+                self._held.invalidate()
+                self._held = None
+        
+        connection = db.engine.connect()
+        acquired = connection.execute(text('SELECT pg_try_advisory_lock(:key)'),
+                                      {'key': _ADVISORY_LOCK_KEY}).scalar()
+        connection.commit()
+        if acquired:
+            self._held = connection
+        else:
+            connection.close()
+        return bool(acquired)
+    
+    def _check_file(self):
+        if self._held is not None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        handle = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._held = handle
+        return True
+
+
+def start_hot_score_refresher(flask_app):
+    """Recompute hot scores every HOT_RECOMPUTE_SECONDS in a daemon thread (disabled when 0).
+    
+    Every serving process starts one, but only the RecomputeLeader writes.
+    Behind PgBouncer in transaction mode a session lock cannot be held, so
+    the refresher is off there; schedule `flask recompute-hot-scores` instead.
+    """
+    interval = flask_app.config['HOT_RECOMPUTE_SECONDS']
+    if interval <= 0:
+        return None
+    if flask_app.config['DB_PGBOUNCER']:
+        logging.info('Hot score refresher disabled behind PgBouncer; schedule `flask recompute-hot-scores`')
+        return None
+    
+    leader = RecomputeLeader(flask_app.config['HOT_RECOMPUTE_LOCK_PATH'])
+    
+    def run():
+        while True:
+            time.sleep(interval)
+            with flask_app.app_context():
+                try:
+                    if leader.check():
+                        recompute_hot_scores()
+                except Exception:
+                    logging.exception('Hot score recompute failed')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+    
+    thread = threading.Thread(target=run, name='hot-scores', daemon=True)
+    thread.start()
+    return thread
@@ -1,25 +1,44 @@
+import io
 import os
+import re
 from datetime import datetime
-from flask import request, jsonify, send_from_directory, session
+from flask import Response, request, jsonify, send_file, send_from_directory, session
 from app import app, db
-from models import User, Project, Comment, Vote, Collaboration, Donation, Discussion, DiscussionReply, DiscussionLike, ReplyReaction, Notification, TeamChat, CommentReaction, ProjectAttachment
-from sqlalchemy import desc, func
-
-# Helper function to create notifications
-def create_notification(user_id, type, title, message, related_user_id=None, project_id=None):
-    try:
-        notification = Notification()
-        notification.user_id = user_id
-        notification.type = type
-        notification.title = title
-        notification.message = message
-        notification.related_user_id = related_user_id
-        notification.project_id = project_id
-        db.session.add(notification)
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error creating notification: {e}")
+from models import User, Project, Comment, Vote, Collaboration, Donation, Discussion, DiscussionReply, DiscussionLike, ReplyReaction, Notification, TeamChat, CommentReaction, ProjectAttachment, MediaAsset, adjust_counter, user_summary
+from sqlalchemy import case, desc, func
+from discussion_threads import load_reply_thread
+from notifications import notify
+from pagination import InvalidCursor, count_total, keyset_page, page_size
+from search import discussion_matches, highlight, people_matches
+from stats_cache import cached_stats
+from ranking import bump_hot_score
+from trending import WINDOWS, record_activity, record_recategorized, record_removed, trending_page
+from pubsub import format_sse, hub, stream_slots
+from pool_metrics import pool_status
+from conditional import etag_for, not_modified, with_etag
+from blob_store import AVATAR_SIZES, MEDIA_MIME_TYPES, MEDIA_SNIFF_BYTES, BlobTooLarge, avatar_store, data_url_mime_type, decode_data_url, media_store, sniff_media_type, store_avatar, store_stream
+
+# Helper function to stream an uploaded discussion image/video into the media store
+def create_media_asset(stream, user_id, mime_type, filename):
+    mime_type = 'image/jpeg' if mime_type == 'image/jpg' else mime_type
+    if mime_type not in MEDIA_MIME_TYPES:
+        raise ValueError('Only JPEG, PNG, GIF, WebP, MP4 and WebM uploads are supported')
+    
+    # The declared type must match the file's magic bytes, so nothing else is stored under an image label
+    head = stream.read(MEDIA_SNIFF_BYTES)
+    if sniff_media_type(head) != mime_type:
+        raise ValueError(f'File content is not {mime_type}')
+    digest, size = store_stream(media_store(), stream, app.config['MEDIA_MAX_BYTES'], head=head)
+    
+    asset = MediaAsset()
+    asset.media_type = mime_type.split('/', 1)[0]
+    asset.mime_type = mime_type
+    asset.original_filename = filename or 'uploaded_file'
+    asset.file_size = size
+    asset.sha256 = digest
+    asset.user_id = user_id
+    db.session.add(asset)
+    return asset
 
 # Serve static HTML files
 @app.route('/')
@@ -176,14 +195,44 @@ def get_current_user():
     return jsonify({'user': user.to_dict()}), 200
 
 # Project APIs
+# Version watermarks for conditional GETs (see conditional.py). Profile edits
+# stamp users.updated_at; rows from before that column existed use created_at.
+user_watermark = func.coalesce(User.updated_at, User.created_at)
+
+# Helper: (count, id checksum, newest edit, newest author profile edit) of the
+# rows `query` selects, which moves on any insert, delete or edit among them
+def rows_version(query, model):
+    return tuple(query.join(User, User.id == model.user_id).with_entities(
+        func.count(model.id), func.sum(model.id), func.max(model.updated_at), func.max(user_watermark)).one())
+
+# Helper: per-type (count, id checksum) of the reactions `query` selects, so a
+# reaction switching from like to heart changes the version too
+def reactions_version(query, model):
+    return sorted(tuple(row) for row in query.with_entities(
+        model.reaction_type, func.count(model.id), func.sum(model.id)).group_by(model.reaction_type).all())
+
+# Helper: per-project (count, id checksum) of the attachments serialized with
+# `project_ids`; uploading one does not touch the project row
+def attachments_version(project_ids):
+    if not project_ids:
+        return []
+    return sorted(tuple(row) for row in ProjectAttachment.query.filter(ProjectAttachment.project_id.in_(project_ids))
+                  .with_entities(ProjectAttachment.project_id, func.count(ProjectAttachment.id),
+                                 func.sum(ProjectAttachment.id))
+                  .group_by(ProjectAttachment.project_id).all())
+
 @app.route('/api/projects', methods=['GET'])
 def get_projects():
     try:
         # Get query parameters
-        sort_by = request.args.get('sort', 'recent')  # recent, popular, funding
+        sort_by = request.args.get('sort', 'recent')  # recent, popular, funding, hot
         category = request.args.get('category', '')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
+        cursor = request.args.get('cursor')
+        per_page = page_size(10)
+        total_mode = request.args.get('total', 'none' if cursor else 'exact')  # exact, estimate, none
+        
+        if total_mode not in ('exact', 'estimate', 'none'):
+            return jsonify({'error': 'total must be exact, estimate or none'}), 400
         
         # Build query
         query = Project.query
@@ -191,33 +240,48 @@ def get_projects():
         if category:
             query = query.filter(Project.category == category)
         
-        # Apply sorting
+        # Sort keys end with the id so every row has a unique position for the cursor
         if sort_by == 'popular':
-            # Sort by vote count (subquery)
-            vote_counts = db.session.query(
-                Vote.project_id,
-                func.count(Vote.id).label('vote_count')
-            ).filter(Vote.is_upvote == True).group_by(Vote.project_id).subquery()
-            
-            query = query.outerjoin(vote_counts, Project.id == vote_counts.c.project_id)\
-                         .order_by(desc(vote_counts.c.vote_count))
+            sort_keys = [(Project.vote_count, True), (Project.id, True)]
         elif sort_by == 'funding':
-            query = query.order_by(desc(Project.current_funding))
+            sort_keys = [(Project.current_funding, True), (Project.id, True)]
+        elif sort_by == 'hot':
+            sort_keys = [(Project.hot_score, True), (Project.id, True)]
         else:  # recent
-            query = query.order_by(desc(Project.created_at))
-        
-        # Paginate
-        paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+            sort_keys = [(Project.created_at, True), (Project.id, True)]
+        
+        # Keyset pagination: pass next_cursor back as `cursor` for the following page.
+        # The page is first read as narrow version rows so a revalidation stops at a 304.
+        versions = query.join(User, User.id == Project.user_id).with_entities(
+            Project.id, Project.created_at, Project.vote_count, Project.current_funding, Project.hot_score,
+            Project.comment_count, Project.collaboration_count, Project.updated_at, user_watermark.label('owner_version'))
+        rows, next_cursor = keyset_page(versions, sort_keys, cursor, per_page)
+        total, total_is_estimate = count_total(query, total_mode)
+        
+        # hot_score only orders the page; it is not part of the response. next_cursor is, and
+        # with total=none nothing else tells a last page from one a new project pushed further
+        ids = [row.id for row in rows]
+        etag = etag_for([(row.id, row.vote_count, row.current_funding, row.comment_count, row.collaboration_count,
+                          row.updated_at, row.owner_version) for row in rows], total, next_cursor,
+                        attachments_version(ids))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        loaded = {project.id: project for project in Project.query.filter(Project.id.in_(ids)).all()} if ids else {}
         user_id = session.get('user_id')
-        projects = [project.to_dict(user_id) for project in paginated.items]
+        projects = Project.bulk_to_dict([loaded[project_id] for project_id in ids if project_id in loaded], user_id)
         
-        return jsonify({
+        return with_etag(jsonify({
             'projects': projects,
-            'total': paginated.total,
-            'pages': paginated.pages,
-            'current_page': page
-        }), 200
-        
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'total': total,
+            'total_is_estimate': total_is_estimate
+        }), etag), 200
+        
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -374,12 +438,32 @@ def delete_project(project_id):
 def uploaded_file(filename):
     return send_from_directory('static/uploads', filename)
 
+# Avatars are content-addressed, so their URLs can be cached forever
+@app.route('/avatars/<avatar_hash>/<size>')
+def avatar_image(avatar_hash, size):
+    if size not in AVATAR_SIZES or not re.fullmatch(r'[0-9a-f]{64}', avatar_hash):
+        return jsonify({'error': 'Avatar not found'}), 404
+    
+    path = avatar_store().path_for(avatar_hash, f'_{size}.webp')
+    return send_from_directory(os.path.dirname(os.path.abspath(path)), os.path.basename(path),
+                               mimetype='image/webp', max_age=31536000)
+
 @app.route('/api/projects/<int:project_id>', methods=['GET'])
 def get_project(project_id):
     try:
+        version = Project.query.join(User, User.id == Project.user_id).filter(Project.id == project_id).with_entities(
+            Project.vote_count, Project.current_funding, Project.comment_count, Project.collaboration_count,
+            Project.updated_at, user_watermark).first()
+        if version is None:
+            return jsonify({'error': 'Project not found'}), 404
+        etag = etag_for(tuple(version), attachments_version([project_id]))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
         user_id = session.get('user_id')
         project = Project.query.get_or_404(project_id)
-        return jsonify({'project': project.to_dict(user_id)}), 200
+        return with_etag(jsonify({'project': project.to_dict(user_id)}), etag), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -400,9 +484,13 @@ def vote_project(project_id):
             # Toggle vote or remove it
             if existing_vote.is_upvote:
                 db.session.delete(existing_vote)
+                adjust_counter(Project, project_id, 'vote_count', -1)
+                bump_hot_score(project, votes=-1)
                 action = 'removed'
             else:
                 existing_vote.is_upvote = True
+                adjust_counter(Project, project_id, 'vote_count', 1)
+                bump_hot_score(project, votes=1)
                 action = 'updated'
         else:
             # Create new upvote
@@ -411,13 +499,15 @@ def vote_project(project_id):
             vote.project_id = project_id
             vote.is_upvote = True
             db.session.add(vote)
+            adjust_counter(Project, project_id, 'vote_count', 1)
+            bump_hot_score(project, votes=1)
             action = 'added'
             
             # Create notification for project owner (only for new votes)
             voter = User.query.get(user_id)
             if voter and project.user_id != user_id:
-                create_notification(
-                    user_id=project.user_id,
+                notify(
+                    [project.user_id],
                     type='vote',
                     title='Project Liked',
                     message=f'{voter.full_name} liked your project "{project.title}"',
@@ -429,7 +519,7 @@ def vote_project(project_id):
         
         return jsonify({
             'message': f'Vote {action} successfully',
-            'vote_count': project.get_vote_count()
+            'vote_count': project.vote_count
         }), 200
         
     except Exception as e:
@@ -441,11 +531,18 @@ def vote_project(project_id):
 def get_comments(project_id):
     try:
         user_id = session.get('user_id')  # Get current user for reaction info
+        etag = etag_for(rows_version(Comment.query.filter(Comment.project_id == project_id), Comment),
+                        reactions_version(CommentReaction.query.join(Comment, CommentReaction.comment_id == Comment.id)
+                                          .filter(Comment.project_id == project_id), CommentReaction))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
         comments = Comment.query.filter_by(project_id=project_id)\
                                .order_by(desc(Comment.created_at)).all()
-        return jsonify({
+        return with_etag(jsonify({
             'comments': [comment.to_dict(user_id) for comment in comments]
-        }), 200
+        }), etag), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -466,14 +563,17 @@ def add_comment(project_id):
         comment.project_id = project_id
         
         db.session.add(comment)
-        db.session.commit()
+        adjust_counter(Project, project_id, 'comment_count', 1)
         
-        # Create notification for project owner
         project = Project.query.get(project_id)
+        if project:
+            bump_hot_score(project, comments=1)
+        
+        # Create notification for project owner
         commenter = User.query.get(user_id)
         if project and commenter and project.user_id != user_id:
-            create_notification(
-                user_id=project.user_id,
+            notify(
+                [project.user_id],
                 type='comment',
                 title='New Comment',
                 message=f'{commenter.full_name} commented on your project "{project.title}"',
@@ -481,6 +581,8 @@ def add_comment(project_id):
                 project_id=project.id
             )
         
+        db.session.commit()
+        
         return jsonify({
             'message': 'Comment added successfully',
             'comment': comment.to_dict(user_id)
@@ -537,6 +639,8 @@ def delete_comment(comment_id):
             return jsonify({'error': 'Permission denied'}), 403
         
         db.session.delete(comment)
+        adjust_counter(Project, comment.project_id, 'comment_count', -1)
+        bump_hot_score(db.session.get(Project, comment.project_id), comments=-1)
         db.session.commit()
         
         return jsonify({'message': 'Comment deleted successfully'}), 200
@@ -629,13 +733,13 @@ def request_collaboration(project_id):
         collaboration.message = data.get('message', '')
         
         db.session.add(collaboration)
-        db.session.commit()
+        adjust_counter(Project, project_id, 'collaboration_count', 1)
         
         # Create notification for project owner
         requester = User.query.get(user_id)
         if requester:
-            create_notification(
-                user_id=project.user_id,
+            notify(
+                [project.user_id],
                 type='collaboration',
                 title='New Collaboration Request',
                 message=f'{requester.full_name} wants to collaborate on "{project.title}"',
@@ -643,6 +747,8 @@ def request_collaboration(project_id):
                 project_id=project.id
             )
         
+        db.session.commit()
+        
         return jsonify({
             'message': 'Collaboration request sent successfully',
             'collaboration': collaboration.to_dict()
@@ -675,15 +781,15 @@ def donate_to_project(project_id):
         
         # Update project funding
         project.current_funding += amount
+        bump_hot_score(project, donated=amount)
         
         db.session.add(donation)
-        db.session.commit()
         
         # Create notification for project owner
         donor = User.query.get(user_id)
         if donor and project.user_id != user_id:
-            create_notification(
-                user_id=project.user_id,
+            notify(
+                [project.user_id],
                 type='donation',
                 title='New Donation Received',
                 message=f'{donor.full_name} donated ${amount:.2f} to your project "{project.title}"',
@@ -691,6 +797,8 @@ def donate_to_project(project_id):
                 project_id=project.id
             )
         
+        db.session.commit()
+        
         return jsonify({
             'message': 'Donation successful',
             'donation': donation.to_dict(),
@@ -709,67 +817,147 @@ def get_dashboard_stats():
         if not user_id:
             return jsonify({'error': 'Authentication required'}), 401
         
+        total_collaborations = Collaboration.query.filter_by(user_id=user_id).count()
+        versions = Project.query.filter_by(user_id=user_id).with_entities(
+            Project.id, Project.vote_count, Project.current_funding, Project.comment_count,
+            Project.collaboration_count, Project.updated_at).order_by(Project.id).all()
+        owner_version = db.session.query(user_watermark).filter(User.id == user_id).scalar()
+        etag = etag_for([tuple(row) for row in versions], owner_version, total_collaborations,
+                        attachments_version([row.id for row in versions]))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
         user_projects = Project.query.filter_by(user_id=user_id).all()
+        projects_data = Project.bulk_to_dict(user_projects)
         total_funding = sum(project.current_funding for project in user_projects)
-        total_votes = sum(project.get_vote_count() for project in user_projects)
-        total_collaborations = Collaboration.query.filter_by(user_id=user_id).count()
+        total_votes = sum(project['vote_count'] for project in projects_data)
         
-        return jsonify({
+        return with_etag(jsonify({
             'total_projects': len(user_projects),
             'total_funding': total_funding,
             'total_votes': total_votes,
             'total_collaborations': total_collaborations,
-            'projects': [project.to_dict() for project in user_projects]
-        }), 200
+            'projects': projects_data
+        }), etag), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Helper to serialize a page of the in-memory trending ranking, best first
+def trending_discussions(window, category, cursor, limit, user_id):
+    ranked, next_cursor, total = trending_page(window, category, cursor, limit)
+    
+    ids = [discussion_id for discussion_id, _ in ranked]
+    loaded = {discussion.id: discussion for discussion in Discussion.query.filter(Discussion.id.in_(ids)).all()} if ids else {}
+    ranked = [(loaded[discussion_id], score) for discussion_id, score in ranked if discussion_id in loaded]
+    
+    discussions = Discussion.bulk_to_dict([discussion for discussion, _ in ranked], user_id)
+    for discussion_data, (_, score) in zip(discussions, ranked):
+        discussion_data['trending_score'] = score
+    return discussions, next_cursor, total
+
 # Discussion APIs
 @app.route('/api/discussions', methods=['GET'])
 def get_discussions():
     try:
         # Get query parameters
-        sort_by = request.args.get('sort', 'recent')  # recent, popular
+        sort_by = request.args.get('sort', 'recent')  # recent, popular, trending
         category = request.args.get('category', '')
         search = request.args.get('search', '')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
+        cursor = request.args.get('cursor')
+        per_page = page_size(10)
+        total_mode = request.args.get('total', 'none' if cursor else 'exact')  # exact, estimate, none
+        
+        if total_mode not in ('exact', 'estimate', 'none'):
+            return jsonify({'error': 'total must be exact, estimate or none'}), 400
+        
+        if sort_by == 'trending' and not search:
+            window = request.args.get('window', 'day')
+            if window not in WINDOWS:
+                return jsonify({'error': 'window must be hour, day or week'}), 400
+            discussions, next_cursor, total = trending_discussions(window, category, cursor, per_page,
+                                                                   session.get('user_id'))
+            return jsonify({
+                'discussions': discussions,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'total': total,
+                'total_is_estimate': False
+            }), 200
+        
+        # Searches go through the full-text index and are ranked by relevance
+        matches = discussion_matches(search) if search else None
         
         # Build query
-        query = Discussion.query
+        if matches is not None:
+            query = db.session.query(Discussion, matches.c.id, matches.c.score, matches.c.snippet)\
+                              .join(matches, matches.c.id == Discussion.id)
+        else:
+            query = Discussion.query
         
         if category:
             query = query.filter(Discussion.category == category)
         
-        if search:
+        if search and matches is None:
+            # No full-text backend on this database
             query = query.filter(Discussion.title.contains(search) | Discussion.content.contains(search))
         
-        # Apply sorting
-        if sort_by == 'popular':
-            # Sort by like count (subquery)
-            like_counts = db.session.query(
-                DiscussionLike.discussion_id,
-                func.count(DiscussionLike.id).label('like_count')
-            ).group_by(DiscussionLike.discussion_id).subquery()
-            
-            query = query.outerjoin(like_counts, Discussion.id == like_counts.c.discussion_id)\
-                         .order_by(desc(like_counts.c.like_count))
+        # Sort keys end with the id so every row has a unique position for the cursor
+        if matches is not None:
+            sort_keys = [(matches.c.score, False), (matches.c.id, False)]
+        elif sort_by == 'popular':
+            sort_keys = [(Discussion.like_count, True), (Discussion.id, True)]
         else:  # recent
-            query = query.order_by(desc(Discussion.created_at))
+            sort_keys = [(Discussion.created_at, True), (Discussion.id, True)]
         
-        # Paginate
-        paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Keyset pagination: pass next_cursor back as `cursor` for the following page
+        items, next_cursor = keyset_page(query, sort_keys, cursor, per_page)
+        total, total_is_estimate = count_total(query, total_mode)
         user_id = session.get('user_id')
-        discussions = [discussion.to_dict(user_id) for discussion in paginated.items]
+        
+        if matches is not None:
+            discussions = Discussion.bulk_to_dict([row.Discussion for row in items], user_id)
+            for discussion, row in zip(discussions, items):
+                discussion['snippet'] = highlight(row.snippet)
+        else:
+            discussions = Discussion.bulk_to_dict(items, user_id)
         
         return jsonify({
             'discussions': discussions,
-            'total': paginated.total,
-            'pages': paginated.pages,
-            'current_page': page
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'total': total,
+            'total_is_estimate': total_is_estimate
+        }), 200
+        
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Discussions with the most likes and replies in the last hour, day or week
+@app.route('/api/discussions/trending', methods=['GET'])
+def get_trending_discussions():
+    try:
+        window = request.args.get('window', 'day')  # hour, day, week
+        if window not in WINDOWS:
+            return jsonify({'error': 'window must be hour, day or week'}), 400
+        
+        discussions, next_cursor, total = trending_discussions(
+            window, request.args.get('category', ''), request.args.get('cursor'), page_size(10),
+            session.get('user_id'))
+        
+        return jsonify({
+            'window': window,
+            'discussions': discussions,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'total': total
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -790,6 +978,8 @@ def toggle_discussion_like(discussion_id):
         if existing_like:
             # Unlike - remove the like
             db.session.delete(existing_like)
+            adjust_counter(Discussion, discussion_id, 'like_count', -1)
+            record_activity(db.session.get(Discussion, discussion_id), 'like', -1, existing_like.created_at)
             liked = False
         else:
             # Like - add new like
@@ -798,14 +988,17 @@ def toggle_discussion_like(discussion_id):
                 user_id=user_id
             )
             db.session.add(new_like)
+            adjust_counter(Discussion, discussion_id, 'like_count', 1)
             liked = True
             
-            # Create notification for discussion owner
             discussion = Discussion.query.get(discussion_id)
+            record_activity(discussion, 'like')
+            
+            # Create notification for discussion owner
             liker = User.query.get(user_id)
             if discussion and liker and discussion.user_id != user_id:
-                create_notification(
-                    user_id=discussion.user_id,
+                notify(
+                    [discussion.user_id],
                     type='like',
                     title='Discussion Liked',
                     message=f'{liker.full_name} liked your discussion "{discussion.title}"',
@@ -816,7 +1009,7 @@ def toggle_discussion_like(discussion_id):
         db.session.commit()
         
         # Get updated like count
-        like_count = DiscussionLike.query.filter_by(discussion_id=discussion_id).count()
+        like_count = db.session.query(Discussion.like_count).filter_by(id=discussion_id).scalar() or 0
         
         return jsonify({
             'liked': liked,
@@ -849,11 +1042,29 @@ def create_discussion():
         discussion.tags = ','.join(data.get('tags', []))
         discussion.user_id = user_id
         
-        # Handle media upload
-        if data.get('media_data') and data.get('media_type'):
-            discussion.media_type = data['media_type']
-            discussion.media_url = data['media_data']  # Store base64 data
-            discussion.media_filename = data.get('media_filename', 'uploaded_file')
+        # Attach media uploaded through /api/media
+        if data.get('media_id'):
+            asset = MediaAsset.query.filter_by(id=data['media_id'], user_id=user_id).first()
+            if not asset:
+                return jsonify({'error': 'Media not found'}), 400
+        # Legacy clients still send the file inline as a base64 data URL
+        elif data.get('media_data') and data.get('media_type'):
+            try:
+                asset = create_media_asset(io.BytesIO(decode_data_url(data['media_data'])), user_id,
+                                           data_url_mime_type(data['media_data']),
+                                           data.get('media_filename', 'uploaded_file'))
+            except BlobTooLarge as e:
+                return jsonify({'error': str(e)}), 413
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            db.session.flush()
+        else:
+            asset = None
+        
+        if asset:
+            discussion.media_id = asset.id
+            discussion.media_type = asset.media_type
+            discussion.media_filename = asset.original_filename
         
         db.session.add(discussion)
         db.session.commit()
@@ -867,6 +1078,59 @@ def create_discussion():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Media upload API: multipart field 'file', or the raw file as the request body
+@app.route('/api/media', methods=['POST'])
+def upload_media():
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        if request.content_length and request.content_length > app.config['MEDIA_MAX_BYTES'] + 64 * 1024:
+            return jsonify({'error': 'File is too large'}), 413
+        
+        if request.mimetype == 'multipart/form-data':
+            file = request.files.get('file')
+            if not file or not file.filename:
+                return jsonify({'error': 'file is required'}), 400
+            stream, mime_type, filename = file.stream, file.mimetype, file.filename
+        else:
+            stream, mime_type = request.stream, request.mimetype
+            filename = request.headers.get('X-Filename', 'uploaded_file')
+        
+        try:
+            asset = create_media_asset(stream, user_id, mime_type, filename)
+        except BlobTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Media uploaded successfully',
+            'media': asset.to_dict()
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Serve uploaded media; conditional responses give browsers Range/206 support for video scrubbing
+@app.route('/media/<int:media_id>')
+def serve_media(media_id):
+    asset = MediaAsset.query.get_or_404(media_id)
+    # Assets stored before uploads were sniffed may be any type; those are only ever downloaded
+    inline = asset.mime_type in MEDIA_MIME_TYPES
+    response = send_file(os.path.abspath(media_store().path_for(asset.sha256)),
+                         mimetype=asset.mime_type if inline else 'application/octet-stream',
+                         as_attachment=not inline, download_name=asset.original_filename,
+                         conditional=True, etag=asset.sha256, max_age=31536000)
+    # User content on our own origin: never let the browser reinterpret it or run script in it
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['Content-Security-Policy'] = 'sandbox'
+    return response
+
 @app.route('/api/discussions/<int:discussion_id>', methods=['PUT'])
 def update_discussion(discussion_id):
     try:
@@ -889,11 +1153,14 @@ def update_discussion(discussion_id):
                 return jsonify({'error': f'{field} is required'}), 400
         
         # Update discussion fields
+        category_changed = discussion.category != data['category']
         discussion.title = data['title']
         discussion.content = data['content']
         discussion.category = data['category']
         discussion.tags = ','.join(data.get('tags', []))
         discussion.updated_at = datetime.utcnow()
+        if category_changed:
+            record_recategorized(discussion)
         
         db.session.commit()
         
@@ -920,6 +1187,7 @@ def delete_discussion(discussion_id):
             return jsonify({'error': 'Permission denied'}), 403
         
         db.session.delete(discussion)
+        record_removed(discussion_id)
         db.session.commit()
         
         return jsonify({'message': 'Discussion deleted successfully'}), 200
@@ -932,11 +1200,24 @@ def delete_discussion(discussion_id):
 def get_discussion(discussion_id):
     try:
         user_id = session.get('user_id')
+        version = Discussion.query.join(User, User.id == Discussion.user_id).filter(Discussion.id == discussion_id)\
+                                  .with_entities(Discussion.like_count, Discussion.reply_count, Discussion.updated_at,
+                                                 user_watermark).first()
+        if version is None:
+            return jsonify({'error': 'Discussion not found'}), 404
+        # is_liked is per user: another user unliking could cancel this user's like out of like_count
+        liked = user_id and DiscussionLike.query.filter_by(discussion_id=discussion_id, user_id=user_id)\
+                                                .with_entities(DiscussionLike.id).scalar()
+        etag = etag_for(tuple(version), liked)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
         discussion = Discussion.query.get_or_404(discussion_id)
         
-        return jsonify({
-            'discussion': discussion.to_dict(user_id)
-        }), 200
+        return with_etag(jsonify({
+            'discussion': Discussion.bulk_to_dict([discussion], user_id)[0]
+        }), etag), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -947,12 +1228,21 @@ def get_discussion(discussion_id):
 def get_discussion_replies(discussion_id):
     try:
         user_id = session.get('user_id')
-        # Only get top-level replies (parent_reply_id is None)
-        replies = DiscussionReply.query.filter_by(discussion_id=discussion_id, parent_reply_id=None)\
-                                     .order_by(desc(DiscussionReply.created_at)).all()
-        return jsonify({
-            'replies': [reply.to_dict(user_id) for reply in replies]
-        }), 200
+        etag = etag_for(rows_version(DiscussionReply.query.filter(DiscussionReply.discussion_id == discussion_id),
+                                     DiscussionReply),
+                        reactions_version(ReplyReaction.query.join(DiscussionReply, ReplyReaction.reply_id == DiscussionReply.id)
+                                          .filter(DiscussionReply.discussion_id == discussion_id), ReplyReaction))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        # Top-level replies, newest first, with their nested replies attached;
+        # more_replies counts top-level replies cut off by THREAD_MAX_REPLIES
+        replies, more_replies = load_reply_thread(discussion_id, user_id, newest_first=True)
+        return with_etag(jsonify({
+            'replies': replies,
+            'more_replies': more_replies
+        }), etag), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -973,14 +1263,16 @@ def add_discussion_reply(discussion_id):
         reply.discussion_id = discussion_id
         
         db.session.add(reply)
-        db.session.commit()
+        adjust_counter(Discussion, discussion_id, 'reply_count', 1)
         
-        # Create notification for discussion owner
         discussion = Discussion.query.get(discussion_id)
+        record_activity(discussion, 'reply')
+        
+        # Create notification for discussion owner
         replier = User.query.get(user_id)
         if discussion and replier and discussion.user_id != user_id:
-            create_notification(
-                user_id=discussion.user_id,
+            notify(
+                [discussion.user_id],
                 type='reply',
                 title='New Discussion Reply',
                 message=f'{replier.full_name} replied to your discussion "{discussion.title}"',
@@ -988,6 +1280,8 @@ def add_discussion_reply(discussion_id):
                 project_id=None
             )
         
+        db.session.commit()
+        
         return jsonify({
             'message': 'Reply added successfully',
             'reply': reply.to_dict(user_id)
@@ -1095,6 +1389,8 @@ def delete_discussion_reply(reply_id):
             return jsonify({'error': 'Permission denied'}), 403
         
         db.session.delete(reply)
+        adjust_counter(Discussion, reply.discussion_id, 'reply_count', -1)
+        record_activity(db.session.get(Discussion, reply.discussion_id), 'reply', -1, reply.created_at)
         db.session.commit()
         
         return jsonify({'message': 'Reply deleted successfully'}), 200
@@ -1124,6 +1420,8 @@ def add_nested_reply(parent_reply_id):
         nested_reply.parent_reply_id = parent_reply_id
         
         db.session.add(nested_reply)
+        adjust_counter(Discussion, parent_reply.discussion_id, 'reply_count', 1)
+        record_activity(parent_reply.discussion, 'reply')
         db.session.commit()
         
         return jsonify({
@@ -1135,23 +1433,26 @@ def add_nested_reply(parent_reply_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def compute_discussion_stats():
+    # Ideas shared count = number of discussion posts (total discussions)
+    ideas_shared = Discussion.query.count()
+    
+    # Community members = unique users who have posted discussions
+    community_members = db.session.query(Discussion.user_id).distinct().count()
+    
+    # Active discussions = total number of replies across all discussions
+    active_discussions = DiscussionReply.query.count()
+    
+    return {
+        'totalDiscussions': active_discussions,  # Active discussions (replies count)
+        'activeMembers': community_members,       # Community members (unique posters)
+        'ideasShared': ideas_shared              # Ideas shared (total discussion posts)
+    }
+
 @app.route('/api/discussions/stats', methods=['GET'])
 def get_discussion_stats():
     try:
-        # Ideas shared count = number of discussion posts (total discussions)
-        ideas_shared = Discussion.query.count()
-        
-        # Community members = unique users who have posted discussions
-        community_members = db.session.query(Discussion.user_id).distinct().count()
-        
-        # Active discussions = total number of replies across all discussions
-        active_discussions = DiscussionReply.query.count()
-        
-        return jsonify({
-            'totalDiscussions': active_discussions,  # Active discussions (replies count)
-            'activeMembers': community_members,       # Community members (unique posters)
-            'ideasShared': ideas_shared              # Ideas shared (total discussion posts)
-        }), 200
+        return jsonify(cached_stats('discussions', ('discussions', 'discussion_replies'), compute_discussion_stats)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1160,11 +1461,11 @@ def get_discussion_stats():
 def get_discussion_comments(discussion_id):
     try:
         user_id = session.get('user_id')
-        # Get top-level replies (comments) for this discussion
-        comments = DiscussionReply.query.filter_by(discussion_id=discussion_id, parent_reply_id=None)\
-                                      .order_by(DiscussionReply.created_at).all()
+        # Get top-level replies (comments) for this discussion with their nested replies
+        comments, more_comments = load_reply_thread(discussion_id, user_id)
         return jsonify({
-            'comments': [comment.to_dict(user_id) for comment in comments]
+            'comments': comments,
+            'more_comments': more_comments
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1187,6 +1488,8 @@ def add_discussion_comment(discussion_id):
         # No parent_reply_id means it's a top-level comment
         
         db.session.add(comment)
+        adjust_counter(Discussion, discussion_id, 'reply_count', 1)
+        record_activity(db.session.get(Discussion, discussion_id), 'reply')
         db.session.commit()
         
         return jsonify({
@@ -1245,6 +1548,8 @@ def delete_discussion_comment(comment_id):
             return jsonify({'error': 'Permission denied'}), 403
         
         db.session.delete(comment)
+        adjust_counter(Discussion, comment.discussion_id, 'reply_count', -1)
+        record_activity(db.session.get(Discussion, comment.discussion_id), 'reply', -1, comment.created_at)
         db.session.commit()
         
         return jsonify({'message': 'Comment deleted successfully'}), 200
@@ -1316,6 +1621,8 @@ def add_discussion_comment_reply(comment_id):
         reply.parent_reply_id = comment_id
         
         db.session.add(reply)
+        adjust_counter(Discussion, parent_comment.discussion_id, 'reply_count', 1)
+        record_activity(parent_comment.discussion, 'reply')
         db.session.commit()
         
         return jsonify({
@@ -1357,7 +1664,19 @@ def update_profile():
         if 'skills' in data:
             user.skills = data['skills']
         if 'profile_image' in data:
-            user.profile_image = data['profile_image']
+            profile_image = data['profile_image']
+            if not profile_image:
+                user.profile_image = None
+                user.avatar_hash = None
+            elif profile_image.startswith('data:'):
+                try:
+                    user.avatar_hash = store_avatar(profile_image)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                user.profile_image = None
+            elif profile_image != user.avatar_url():
+                user.profile_image = profile_image
+                user.avatar_hash = None
         if 'phone' in data:
             user.phone = data['phone']
         if 'location' in data:
@@ -1392,9 +1711,11 @@ def get_user_profile(user_id):
         # Get user's projects
         user_projects = Project.query.filter_by(user_id=user_id).order_by(desc(Project.created_at)).all()
         
+        projects_data = Project.bulk_to_dict(user_projects)
+        
         # Get user stats
         total_funding = sum(project.current_funding for project in user_projects)
-        total_votes = sum(project.get_vote_count() for project in user_projects)
+        total_votes = sum(project['vote_count'] for project in projects_data)
         total_collaborations = Collaboration.query.filter_by(user_id=user_id).count()
         
         profile_data = user.to_dict()
@@ -1403,7 +1724,7 @@ def get_user_profile(user_id):
             'total_funding': total_funding,
             'total_votes': total_votes,
             'total_collaborations': total_collaborations,
-            'projects': [project.to_dict() for project in user_projects]
+            'projects': projects_data
         })
         
         return jsonify({'profile': profile_data}), 200
@@ -1415,29 +1736,67 @@ def get_user_profile(user_id):
 def get_users():
     try:
         search = request.args.get('search', '')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
-        
-        query = User.query
+        cursor = request.args.get('cursor')
+        per_page = page_size(20)
+        total_mode = request.args.get('total', 'none' if cursor else 'exact')  # exact, estimate, none
+        
+        if total_mode not in ('exact', 'estimate', 'none'):
+            return jsonify({'error': 'total must be exact, estimate or none'}), 400
+        
+        if request.args.get('typeahead') and search:
+            # Typeahead: the best few matches as summaries, with no paging or totals
+            limit = min(max(request.args.get('limit', 8, type=int), 1), 20)
+            matches = people_matches(search, typeahead_limit=limit)
+            if matches is not None:
+                users = db.session.query(User).join(matches, matches.c.id == User.id)\
+                                  .order_by(matches.c.score, matches.c.id).limit(limit).all()
+            else:
+                users = User.query.filter(User.username.startswith(search) | User.full_name.startswith(search))\
+                                  .order_by(User.username).limit(limit).all()
+            return jsonify({'users': [dict(user_summary(user), college=user.college) for user in users]}), 200
         
-        if search:
-            query = query.filter(
-                User.full_name.contains(search) |
-                User.username.contains(search) |
-                User.college.contains(search)
-            )
+        # Searches go through the people index and are ranked by relevance
+        matches = people_matches(search) if search else None
         
-        # Paginate results
-        paginated = query.paginate(page=page, per_page=per_page, error_out=False)
-        users = [user.to_dict() for user in paginated.items]
+        if matches is not None:
+            query = db.session.query(User, matches.c.id, matches.c.score)\
+                              .join(matches, matches.c.id == User.id)
+            sort_keys = [(matches.c.score, False), (matches.c.id, False)]
+        else:
+            query = User.query
+            if search:
+                # No people index on this database
+                query = query.filter(
+                    User.full_name.contains(search) |
+                    User.username.contains(search) |
+                    User.college.contains(search) |
+                    User.skills.contains(search)
+                )
+            # Signup order
+            sort_keys = [(User.id, False)]
+        
+        # Keyset pagination: pass next_cursor back as `cursor` for the following page.
+        # Deprecated: page numbers (page/pages/current_page) still work for one more
+        # release; without a cursor, page > 1 skips ahead with OFFSET as before.
+        page = max(request.args.get('page', 1, type=int), 1) if not cursor else None
+        items, next_cursor = keyset_page(query, sort_keys, cursor, per_page, offset=(page - 1) * per_page if page else 0)
+        total, total_is_estimate = count_total(query, total_mode)
+        if matches is not None:
+            items = [row.User for row in items]
+        users = [user.to_directory_entry() for user in items]
         
         return jsonify({
             'users': users,
-            'total': paginated.total,
-            'pages': paginated.pages,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'total': total,
+            'total_is_estimate': total_is_estimate,
+            'pages': -(-total // per_page) if total is not None and not total_is_estimate else None,
             'current_page': page
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1626,6 +1985,26 @@ def get_user_collaborations():
         if not user_id:
             return jsonify({'error': 'Authentication required'}), 401
         
+        # Requests (and their status) on the user's projects, plus the project titles and requester profiles shown
+        version = db.session.query(
+            func.count(Collaboration.id),
+            func.sum(Collaboration.id),
+            func.sum(case((Collaboration.status == 'accepted', 1), (Collaboration.status == 'rejected', 2), else_=0)
+                     * Collaboration.id),
+            func.max(Project.updated_at),
+            func.max(user_watermark)
+        ).join(
+            Project, Collaboration.project_id == Project.id
+        ).join(
+            User, Collaboration.user_id == User.id
+        ).filter(
+            Project.user_id == user_id
+        ).one()
+        etag = etag_for(tuple(version))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
         # Get collaborations for projects owned by the user with user and project details
         collaborations = db.session.query(
             Collaboration,
@@ -1659,9 +2038,9 @@ def get_user_collaborations():
             }
             collab_list.append(collab_dict)
         
-        return jsonify({
+        return with_etag(jsonify({
             'collaborations': collab_list
-        }), 200
+        }), etag), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1680,14 +2059,13 @@ def accept_collaboration(collab_id):
             return jsonify({'error': 'Unauthorized'}), 403
         
         collaboration.status = 'accepted'
-        db.session.commit()
         
         # Create notification for the collaborator
         requester = User.query.get(collaboration.user_id)
         project = Project.query.get(collaboration.project_id)
         if requester and project:
-            create_notification(
-                user_id=collaboration.user_id,
+            notify(
+                [collaboration.user_id],
                 type='collaboration',
                 title='Collaboration Accepted',
                 message=f'Your collaboration request for "{project.title}" has been accepted!',
@@ -1695,6 +2073,8 @@ def accept_collaboration(collab_id):
                 project_id=project.id
             )
         
+        db.session.commit()
+        
         return jsonify({
             'message': 'Collaboration request accepted',
             'collaboration': collaboration.to_dict()
@@ -1737,18 +2117,37 @@ def get_notifications():
         if not user_id:
             return jsonify({'error': 'Authentication required'}), 401
         
-        # Get notifications from database
-        notifications = Notification.query.filter_by(user_id=user_id)\
-            .order_by(desc(Notification.created_at))\
-            .limit(50).all()
+        # Keyset pagination: newest first, pass next_before to get the following page
+        before = request.args.get('before', type=int)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 100)
+        
+        query = Notification.query.filter_by(user_id=user_id)
+        if before:
+            query = query.filter(Notification.id < before)
+        
+        # The page as (id, read flag, actor profile, project title) versions first
+        versions = query.outerjoin(User, User.id == Notification.related_user_id)\
+                        .outerjoin(Project, Project.id == Notification.project_id)\
+                        .with_entities(Notification.id, Notification.is_read, user_watermark, Project.updated_at)\
+                        .order_by(desc(Notification.id)).limit(limit).all()
         
         # Count unread notifications
         unread_count = Notification.query.filter_by(user_id=user_id, is_read=False).count()
         
-        return jsonify({
-            'notifications': [n.to_dict() for n in notifications],
-            'unread_count': unread_count
-        }), 200
+        ids = [row.id for row in versions]
+        next_before = ids[-1] if len(ids) == limit else None
+        etag = etag_for([tuple(row) for row in versions], unread_count, next_before)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        notifications = Notification.query.filter(Notification.id.in_(ids)).order_by(desc(Notification.id)).all() if ids else []
+        
+        return with_etag(jsonify({
+            'notifications': Notification.bulk_to_dict(notifications),
+            'unread_count': unread_count,
+            'next_before': next_before
+        }), etag), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1768,6 +2167,101 @@ def get_notification_count():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Server-Sent Events stream of unread counts, new notifications and team chat messages (replaces polling)
+@app.route('/api/notifications/stream', methods=['GET'])
+def stream_notifications():
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    # Streams pin a server thread each; past the per-process cap the client polls
+    # /api/notifications/count and /api/projects/<id>/chat?after_id= instead
+    if not stream_slots.acquire():
+        response = jsonify({'error': 'Too many open streams, poll instead'})
+        response.headers['Retry-After'] = str(app.config['SSE_MAX_SECONDS'])
+        return response, 503
+    
+    try:
+        # All queries run here, so the connection is released before the stream starts
+        unread_count = Notification.query.filter_by(user_id=user_id, is_read=False).count()
+        
+        # Chat rooms of every project the user owns or collaborates on ride this one stream,
+        # so a tab holds a single connection. Membership is checked once, when it is opened.
+        owned = db.session.query(Project.id).filter(Project.user_id == user_id)
+        joined = db.session.query(Collaboration.project_id).filter(Collaboration.user_id == user_id,
+                                                                   Collaboration.status == 'accepted')
+        rooms = sorted({project_id for (project_id,) in owned.union(joined).all()})
+        
+        # Subscribe before replaying so nothing committed in between is lost
+        subscription = hub.subscribe(f'user:{user_id}', *(f'chat:{project_id}' for project_id in rooms))
+        
+        # On reconnect the browser sends the last chat message ID it saw; replay what it missed
+        missed = []
+        needs_resync = False
+        last_event_id = request.headers.get('Last-Event-ID', type=int)
+        if last_event_id and rooms:
+            replay_limit = app.config['CHAT_REPLAY_LIMIT']
+            rows = TeamChat.query.filter(TeamChat.project_id.in_(rooms), TeamChat.id > last_event_id)\
+                                 .order_by(TeamChat.id).limit(replay_limit + 1).all()
+            needs_resync = len(rows) > replay_limit
+            missed = TeamChat.bulk_to_dict(rows[:replay_limit])
+    except Exception:
+        stream_slots.release()
+        raise
+    
+    heartbeat = app.config['SSE_HEARTBEAT_SECONDS']
+    deadline = datetime.utcnow().timestamp() + app.config['SSE_MAX_SECONDS']
+    
+    def generate(unread_count):
+        yield 'retry: 5000\n\n'
+        yield format_sse('rooms', {'project_ids': rooms})
+        if needs_resync:
+            yield format_sse('resync', {})
+        yield format_sse('unread_count', {'unread_count': unread_count})
+        sent = set()
+        for message in missed:
+            sent.add(message['id'])
+            yield format_sse('chat_message', message, event_id=message['id'])
+        
+        while datetime.utcnow().timestamp() < deadline:
+            events = subscription.get(timeout=heartbeat)
+            if subscription.take_overflow():
+                # Too far behind to replay; ask the client to refetch instead of stalling the rooms
+                yield format_sse('resync', {})
+                continue
+            if not events:
+                yield ': keepalive\n\n'
+                continue
+            
+            counted = False
+            for event in events:
+                if event['type'] == 'message':
+                    message = event['message']
+                    if message['id'] not in sent:
+                        sent.add(message['id'])
+                        yield format_sse('chat_message', message, event_id=message['id'])
+                    continue
+                counted = True
+                if event['type'] == 'notification':
+                    unread_count += 1
+                    yield format_sse('notification', event['notification'])
+                elif event['type'] == 'unread_delta':
+                    unread_count = max(unread_count + event['delta'], 0)
+                elif event['type'] == 'unread_count':
+                    unread_count = event['unread_count']
+            if counted:
+                yield format_sse('unread_count', {'unread_count': unread_count})
+    
+    def close():
+        # Runs when the response is closed, even if the generator never started
+        hub.unsubscribe(subscription)
+        stream_slots.release()
+    
+    response = Response(generate(unread_count), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(close)
+    return response
+
 @app.route('/api/notifications/<int:notification_id>/read', methods=['POST'])
 def mark_notification_read(notification_id):
     try:
@@ -1777,9 +2271,10 @@ def mark_notification_read(notification_id):
         
         # Find and mark notification as read
         notification = Notification.query.filter_by(id=notification_id, user_id=user_id).first()
-        if notification:
+        if notification and not notification.is_read:
             notification.is_read = True
             db.session.commit()
+            hub.publish(f'user:{user_id}', {'type': 'unread_delta', 'delta': -1})
         
         return jsonify({'message': 'Notification marked as read'}), 200
         
@@ -1797,6 +2292,7 @@ def mark_all_notifications_read():
         # Mark all notifications as read for this user
         Notification.query.filter_by(user_id=user_id, is_read=False).update({'is_read': True})
         db.session.commit()
+        hub.publish(f'user:{user_id}', {'type': 'unread_count', 'unread_count': 0})
         
         return jsonify({'message': 'All notifications marked as read'}), 200
         
@@ -1814,6 +2310,7 @@ def clear_all_notifications():
         # Delete all notifications for this user
         Notification.query.filter_by(user_id=user_id).delete()
         db.session.commit()
+        hub.publish(f'user:{user_id}', {'type': 'unread_count', 'unread_count': 0})
         
         return jsonify({'message': 'All notifications cleared'}), 200
         
@@ -1822,19 +2319,22 @@ def clear_all_notifications():
         return jsonify({'error': str(e)}), 500
 
 # Homepage stats API with accurate donation totals
+def compute_homepage_stats():
+    total_projects = Project.query.count()
+    total_users = User.query.count()
+    # Total funding = sum of all project funding goals (what users set as their goals)
+    total_funding = db.session.query(func.sum(Project.funding_goal)).scalar() or 0
+    
+    return {
+        'totalProjects': total_projects,
+        'totalUsers': total_users,
+        'totalFunding': total_funding
+    }
+
 @app.route('/api/homepage/stats', methods=['GET'])
 def get_homepage_stats():
     try:
-        total_projects = Project.query.count()
-        total_users = User.query.count()
-        # Total funding = sum of all project funding goals (what users set as their goals)
-        total_funding = db.session.query(func.sum(Project.funding_goal)).scalar() or 0
-        
-        return jsonify({
-            'totalProjects': total_projects,
-            'totalUsers': total_users,
-            'totalFunding': total_funding
-        }), 200
+        return jsonify(cached_stats('homepage', ('projects', 'users'), compute_homepage_stats)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1861,7 +2361,7 @@ def get_user_team():
                 team_member = {
                     'project_id': project.id,
                     'project_title': project.title,
-                    'user': collab.collaborator.to_dict(),
+                    'user': dict(user_summary(collab.collaborator), college=collab.collaborator.college),
                     'collaboration_date': collab.created_at.isoformat()
                 }
                 team_members.append(team_member)
@@ -1876,7 +2376,7 @@ def get_user_team():
             team_member = {
                 'project_id': collab.project.id,
                 'project_title': collab.project.title,
-                'user': collab.project.owner.to_dict(),
+                'user': dict(user_summary(collab.project.owner), college=collab.project.owner.college),
                 'collaboration_date': collab.created_at.isoformat(),
                 'is_owner': True
             }
@@ -1907,14 +2407,40 @@ def get_project_chat(project_id):
         if not (is_owner or is_collaborator):
             return jsonify({'error': 'Access denied'}), 403
         
-        # Get chat messages for this project
-        messages = TeamChat.query.filter_by(project_id=project_id)\
-            .order_by(TeamChat.created_at.asc()).all()
-        
-        return jsonify({
-            'messages': [msg.to_dict() for msg in messages],
-            'project': project.to_dict()
-        }), 200
+        # Cursor pagination by message ID: the latest page by default, before_id for
+        # older history, after_id for only the messages newer than the client's last seen.
+        # The page is first read as IDs so a revalidation stops at a 304.
+        before_id = request.args.get('before_id', type=int)
+        after_id = request.args.get('after_id', type=int)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+        
+        query = TeamChat.query.filter(TeamChat.project_id == project_id).with_entities(TeamChat.id)
+        if after_id is not None:
+            ids = [row.id for row in query.filter(TeamChat.id > after_id)
+                   .order_by(TeamChat.id.asc()).limit(limit + 1).all()]
+            has_more = len(ids) > limit
+            ids = ids[:limit]
+        else:
+            if before_id is not None:
+                query = query.filter(TeamChat.id < before_id)
+            ids = [row.id for row in query.order_by(desc(TeamChat.id)).limit(limit + 1).all()]
+            has_more = len(ids) > limit
+            ids = ids[:limit][::-1]
+        
+        # Messages are never edited, so the page's IDs and its authors' profiles version it
+        author_version = db.session.query(func.max(user_watermark)).join(TeamChat, TeamChat.user_id == User.id)\
+                                   .filter(TeamChat.id.in_(ids)).scalar() if ids else None
+        etag = etag_for(ids, has_more, author_version, project.title)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        messages = TeamChat.query.filter(TeamChat.id.in_(ids)).order_by(TeamChat.id.asc()).all() if ids else []
+        return with_etag(jsonify({
+            'messages': TeamChat.bulk_to_dict(messages),
+            'project': {'id': project.id, 'title': project.title},
+            'has_more': has_more
+        }), etag), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1949,7 +2475,6 @@ def send_chat_message(project_id):
         chat_message.message = data['message']
         
         db.session.add(chat_message)
-        db.session.commit()
         
         # Get current user for notification
         sender = User.query.get(user_id)
@@ -1962,28 +2487,32 @@ def send_chat_message(project_id):
             team_members.append(project.user_id)
         
         # Add accepted collaborators who aren't the sender
-        collaborators = Collaboration.query.filter_by(
+        collaborators = db.session.query(Collaboration.user_id).filter_by(
             project_id=project_id,
             status='accepted'
         ).filter(Collaboration.user_id != user_id).all()
         
-        for collab in collaborators:
-            team_members.append(collab.user_id)
-        
-        # Create notifications for all team members
-        for member_id in team_members:
-            create_notification(
-                user_id=member_id,
-                type='team_chat',
-                title='New Team Message',
-                message=f'{sender.username} sent a message in {project.title}',
-                related_user_id=user_id,
-                project_id=project_id
-            )
+        team_members.extend(collab_user_id for (collab_user_id,) in collaborators)
+        
+        # Notify all team members in one bulk insert, committed with the message
+        notify(
+            team_members,
+            type='team_chat',
+            title='New Team Message',
+            message=f'{sender.username} sent a message in {project.title}',
+            related_user_id=user_id,
+            project_id=project_id
+        )
+        
+        db.session.commit()
+        
+        # Deliver to members whose event stream carries this room
+        message_data = chat_message.to_dict()
+        hub.publish(f'chat:{project_id}', {'type': 'message', 'message': message_data})
         
         return jsonify({
             'message': 'Message sent successfully',
-            'chat_message': chat_message.to_dict()
+            'chat_message': message_data
         }), 201
         
     except Exception as e:
@@ -2016,7 +2545,7 @@ def get_project_participants(project_id):
         owner = User.query.get(project.user_id)
         if owner:
             participants.append({
-                'user': owner.to_dict(),
+                'user': user_summary(owner),
                 'is_owner': True,
                 'joined_at': project.created_at.isoformat() if project.created_at else None
             })
@@ -2029,7 +2558,7 @@ def get_project_participants(project_id):
         
         for collab in collaborators:
             participants.append({
-                'user': collab.user.to_dict(),
+                'user': user_summary(collab.collaborator),
                 'is_owner': False,
                 'joined_at': collab.created_at.isoformat() if collab.created_at else None
             })
@@ -2095,8 +2624,8 @@ def get_project_details(project_id):
             return jsonify({'error': 'Access denied'}), 403
         
         # Get additional stats
-        vote_count = Vote.query.filter_by(project_id=project_id, is_upvote=True).count()
-        comment_count = Comment.query.filter_by(project_id=project_id).count()
+        vote_count = project.vote_count
+        comment_count = project.comment_count
         collaboration_count = Collaboration.query.filter_by(project_id=project_id, status='accepted').count()
         current_funding = db.session.query(func.sum(Donation.amount)).filter_by(project_id=project_id).scalar() or 0
         
@@ -2119,24 +2648,37 @@ def get_project_details(project_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def compute_browse_stats():
+    # Get total number of projects
+    total_projects = Project.query.count()
+    
+    # Get total funding raised (sum of all donations)
+    total_funding = db.session.query(func.sum(Donation.amount)).scalar() or 0
+    
+    # Get total number of unique collaborators (users who have accepted collaborations)
+    total_collaborators = db.session.query(Collaboration.user_id).filter_by(status='accepted').distinct().count()
+    
+    return {
+        'total_projects': total_projects,
+        'total_funding': total_funding,
+        'total_collaborators': total_collaborators
+    }
+
 # Browse page statistics API
 @app.route('/api/stats', methods=['GET'])
 def get_browse_stats():
     try:
-        # Get total number of projects
-        total_projects = Project.query.count()
-        
-        # Get total funding raised (sum of all donations)
-        total_funding = db.session.query(func.sum(Donation.amount)).scalar() or 0
-        
-        # Get total number of unique collaborators (users who have accepted collaborations)
-        total_collaborators = db.session.query(Collaboration.user_id).filter_by(status='accepted').distinct().count()
+        return jsonify(cached_stats('browse', ('projects', 'donations', 'collaborations'), compute_browse_stats)), 200
         
-        return jsonify({
-            'total_projects': total_projects,
-            'total_funding': total_funding,
-            'total_collaborators': total_collaborators
-        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/health/pool', methods=['GET'])
+def get_pool_health():
+    """Connection pool usage of the worker that served the request"""
+    try:
+        return jsonify(pool_status(db.engine)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
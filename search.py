@@ -0,0 +1,206 @@
+import html
+import logging
+import re
+from sqlalchemy import Float, Integer, Text, text
+from app import db
+
+# Sentinels the database wraps around matched terms; swapped for <mark> after escaping
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+# Which backend install_search_indexes() set up per index: 'sqlite' or 'postgresql'
+_backends = {}
+
+# Text people are found by: name, handle, college and skills
+_PEOPLE_FIELDS = "coalesce(username, '') || ' ' || coalesce(full_name, '') || ' ' || " \
+                 "coalesce(college, '') || ' ' || coalesce(skills, '')"
+
+_SQLITE_DISCUSSIONS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS discussions_fts USING fts5(
+        title, content,
+        content='discussions', content_rowid='id',
+        tokenize='porter unicode61', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS discussions_fts_ai AFTER INSERT ON discussions BEGIN
+        INSERT INTO discussions_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS discussions_fts_ad AFTER DELETE ON discussions BEGIN
+        INSERT INTO discussions_fts(discussions_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS discussions_fts_au AFTER UPDATE OF title, content ON discussions BEGIN
+        INSERT INTO discussions_fts(discussions_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO discussions_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+]
+
+_SQLITE_PEOPLE_DDL = [
+    # Every prefix length up to 3 is indexed so one- and two-letter typeahead stays an index lookup
+    """CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        username, full_name, college, skills,
+        content='users', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts(rowid, username, full_name, college, skills)
+        VALUES (new.id, new.username, new.full_name, new.college, new.skills);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, username, full_name, college, skills)
+        VALUES ('delete', old.id, old.username, old.full_name, old.college, old.skills);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF username, full_name, college, skills ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, username, full_name, college, skills)
+        VALUES ('delete', old.id, old.username, old.full_name, old.college, old.skills);
+        INSERT INTO users_fts(rowid, username, full_name, college, skills)
+        VALUES (new.id, new.username, new.full_name, new.college, new.skills);
+    END""",
+]
+
+_POSTGRES_DISCUSSIONS_DDL = [
+    """ALTER TABLE discussions ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(content, '')), 'B')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_discussions_search_vector ON discussions USING GIN (search_vector)",
+]
+
+_POSTGRES_PEOPLE_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users USING GIN (lower({_PEOPLE_FIELDS}) gin_trgm_ops)",
+    # Trigrams need three characters; one- and two-letter typeahead uses these prefix indexes
+    "CREATE INDEX IF NOT EXISTS ix_users_username_prefix ON users (lower(username) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_full_name_prefix ON users (lower(full_name) text_pattern_ops)",
+]
+
+
+def install_search_indexes():
+    """Create the discussion and people search indexes for the current database.
+    
+    SQLite gets FTS5 tables kept in sync by triggers; Postgres gets a tsvector
+    generated column with GIN for discussions and a pg_trgm GIN index for
+    people. The database maintains them on every insert, edit and delete.
+    Indexes that cannot be created leave that search on its LIKE fallback.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        indexes = {'discussions': _SQLITE_DISCUSSIONS_DDL, 'users': _SQLITE_PEOPLE_DDL}
+    elif dialect == 'postgresql':
+        indexes = {'discussions': _POSTGRES_DISCUSSIONS_DDL, 'users': _POSTGRES_PEOPLE_DDL}
+    else:
+        return _backends
+    
+    for name, statements in indexes.items():
+        try:
+            with db.engine.begin() as connection:
+                if dialect == 'sqlite':
+                    exists = connection.execute(text(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :table"
+                    ), {'table': f'{name}_fts'}).first()
+                for ddl in statements:
+                    connection.execute(text(ddl))
+                if dialect == 'sqlite' and not exists:
+                    # Index rows written before the search table existed
+                    connection.execute(text(f"INSERT INTO {name}_fts({name}_fts) VALUES ('rebuild')"))
+        except Exception as e:
+            logging.warning(f'Search index for {name} unavailable, falling back to LIKE: {e}')
+            continue
+        _backends[name] = dialect
+    
+    return _backends
+
+
+def search_terms(query_text):
+    """Split user input into plain word tokens, dropping any query syntax"""
+    return re.findall(r'\w+', query_text or '')
+
+
+def discussion_matches(query_text):
+    """Subquery of discussions matching `query_text` as (id, score, snippet).
+    
+    Lower scores rank higher. The last term matches as a prefix so results
+    update while the user is still typing. Returns None when no full-text
+    backend is installed or the input has no searchable words.
+    """
+    terms = search_terms(query_text)
+    backend = _backends.get('discussions')
+    if backend is None or not terms:
+        return None
+    
+    if backend == 'sqlite':
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        statement = text(
+            "SELECT rowid AS id, bm25(discussions_fts, 10.0, 1.0) AS score, "
+            "snippet(discussions_fts, -1, :start, :end, '…', 16) AS snippet "
+            "FROM discussions_fts WHERE discussions_fts MATCH :match"
+        )
+    else:
+        match = ' & '.join(terms) + ':*'
+        statement = text(
+            "SELECT id, -ts_rank_cd(search_vector, query) AS score, "
+            "ts_headline('english', coalesce(content, ''), query, "
+            "'StartSel=' || :start || ', StopSel=' || :end || ', MaxWords=24, MinWords=8') AS snippet "
+            "FROM discussions, to_tsquery('english', :match) AS query "
+            "WHERE search_vector @@ query"
+        )
+    
+    return statement.bindparams(match=match, start=_MARK_START, end=_MARK_END)\
+                    .columns(id=Integer, score=Float, snippet=Text)\
+                    .subquery('matches')
+
+
+def people_matches(query_text, typeahead_limit=None):
+    """Subquery of users matching `query_text` as (id, score), lower scores first.
+    
+    Every term matches as a prefix (SQLite) or substring (Postgres trigrams),
+    so "jo sm" finds John Smith. With `typeahead_limit`, inputs shorter than
+    three letters skip ranking and return the first name-prefix matches.
+    Returns None when no index is installed or the input has no searchable words.
+    """
+    terms = search_terms(query_text)
+    backend = _backends.get('users')
+    if backend is None or not terms:
+        return None
+    
+    if typeahead_limit and len(''.join(terms)) < 3:
+        # Too broad to rank usefully; read the first few matches straight off the prefix index
+        if backend == 'sqlite':
+            statement = text(
+                "SELECT rowid AS id, 0.0 AS score FROM users_fts WHERE users_fts MATCH :match "
+                "ORDER BY rowid LIMIT :limit"
+            ).bindparams(match='{username full_name}: ' + ' '.join(f'"{term}"*' for term in terms))
+        else:
+            statement = text(
+                "SELECT id, 0.0 AS score FROM users "
+                "WHERE lower(username) LIKE :prefix OR lower(full_name) LIKE :prefix "
+                "ORDER BY id LIMIT :limit"
+            ).bindparams(prefix=terms[0].lower().replace('_', '\\_') + '%')
+        return statement.bindparams(limit=typeahead_limit).columns(id=Integer, score=Float).subquery('matches')
+    
+    if backend == 'sqlite':
+        # Handles and names outrank colleges and skills
+        statement = text(
+            "SELECT rowid AS id, bm25(users_fts, 10.0, 8.0, 2.0, 4.0) AS score "
+            "FROM users_fts WHERE users_fts MATCH :match"
+        ).bindparams(match=' '.join(f'"{term}"*' for term in terms))
+    else:
+        conditions = ' AND '.join(f"lower({_PEOPLE_FIELDS}) LIKE :term_{i}" for i in range(len(terms)))
+        statement = text(
+            f"SELECT id, -word_similarity(:query, lower({_PEOPLE_FIELDS})) AS score "
+            f"FROM users WHERE {conditions}"
+        ).bindparams(query=' '.join(terms).lower(),
+                     **{f'term_{i}': '%' + term.lower().replace('_', '\\_') + '%' for i, term in enumerate(terms)})
+    
+    return statement.columns(id=Integer, score=Float).subquery('matches')
+
+
+def highlight(snippet):
+    """HTML-escape a search snippet and mark the matched terms"""
+    if not snippet:
+        return ''
+    if snippet.count(_MARK_START) != snippet.count(_MARK_END):
+        # Stray sentinel characters in the stored text; drop the marks rather than emit broken HTML
+        snippet = snippet.replace(_MARK_START, '').replace(_MARK_END, '')
+    return html.escape(snippet).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
@@ -0,0 +1,198 @@
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import func, text
+from werkzeug.security import generate_password_hash
+from app import db
+from models import (User, Project, Comment, Vote, Collaboration, Donation, Discussion, DiscussionReply,
+                    DiscussionLike, ReplyReaction, Notification, CommentReaction, CommentReply, TeamChat,
+                    reconcile_counters)
+from ranking import recompute_hot_scores
+
+# Password of every seeded account (usernames are user<id>)
+SEED_PASSWORD = 'password123'
+
+# Rows per table at scale 1, in insert order
+DEFAULT_VOLUMES = {
+    'users': 50_000,
+    'projects': 20_000,
+    'votes': 1_000_000,
+    'comments': 200_000,
+    'comment_replies': 50_000,
+    'comment_reactions': 100_000,
+    'collaborations': 60_000,
+    'donations': 100_000,
+    'team_chats': 200_000,
+    'discussions': 20_000,
+    'discussion_replies': 300_000,
+    'discussion_likes': 300_000,
+    'reply_reactions': 100_000,
+    'notifications': 500_000,
+}
+
+# Replies nest in chains this deep, past THREAD_MAX_DEPTH so truncation is exercised
+DEFAULT_REPLY_DEPTH = 12
+
+_BATCH_SIZE = 10_000
+_CATEGORIES = ['Technology', 'Health', 'Education', 'Environment', 'Arts', 'Social Impact']
+_DISCUSSION_CATEGORIES = ['General', 'Help', 'Ideas', 'Showcase']
+_WORDS = ['solar', 'water', 'campus', 'robot', 'garden', 'library', 'music', 'health', 'code', 'energy',
+          'student', 'design', 'open', 'data', 'mentor', 'build', 'climate', 'food', 'app', 'learning']
+_SKILLS = ['python', 'react', 'design', 'marketing', 'hardware', 'writing', 'research', 'video']
+_NOTIFICATION_TYPES = ['comment', 'vote', 'collaboration', 'donation', 'like', 'reply']
+
+
+def database_is_empty():
+    return db.session.query(func.count(User.id)).scalar() == 0
+
+
+def _pair(index, parents, users):
+    """The index-th distinct (parent id, user id) pair, spreading each parent's rows over different users"""
+    parent = index % parents + 1
+    return parent, (parent * 7919 + index // parents) % users + 1
+
+
+def _rows(table, count, volumes, rng, reply_depth):
+    """Yield `count` rows for `table` with explicit ids starting at 1"""
+    now = datetime.utcnow()
+    users, projects, discussions = volumes['users'], volumes['projects'], volumes['discussions']
+    
+    def words(n):
+        return ' '.join(rng.choice(_WORDS) for _ in range(n))
+    
+    def moment(days=365):
+        return now - timedelta(seconds=rng.random() * days * 86400)
+    
+    if table == 'users':
+        password_hash = generate_password_hash(SEED_PASSWORD)
+        for i in range(1, count + 1):
+            yield {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.edu',
+                   'full_name': f'{words(1).title()} {words(1).title()} {i}', 'college': f'University {i % 400}',
+                   'password_hash': password_hash, 'skills': ', '.join(rng.sample(_SKILLS, 3)),
+                   'bio': words(12), 'created_at': moment()}
+    elif table == 'projects':
+        for i in range(1, count + 1):
+            goal = rng.choice([500, 1000, 5000, 10000])
+            yield {'id': i, 'title': words(3).title(), 'description': words(40), 'category': rng.choice(_CATEGORIES),
+                   'funding_goal': goal, 'current_funding': round(rng.random() * goal, 2),
+                   'status': rng.choice(['active'] * 8 + ['completed', 'paused']),
+                   'user_id': rng.randint(1, users), 'created_at': moment()}
+    elif table == 'votes':
+        for i in range(count):
+            project_id, user_id = _pair(i, projects, users)
+            yield {'id': i + 1, 'project_id': project_id, 'user_id': user_id, 'is_upvote': rng.random() < 0.85,
+                   'created_at': moment()}
+    elif table == 'comments':
+        for i in range(1, count + 1):
+            yield {'id': i, 'content': words(15), 'project_id': rng.randint(1, projects),
+                   'user_id': rng.randint(1, users), 'created_at': moment()}
+    elif table == 'comment_replies':
+        for i in range(1, count + 1):
+            yield {'id': i, 'content': words(10), 'comment_id': rng.randint(1, volumes['comments']),
+                   'user_id': rng.randint(1, users), 'created_at': moment()}
+    elif table == 'comment_reactions':
+        for i in range(count):
+            comment_id, user_id = _pair(i, volumes['comments'], users)
+            yield {'id': i + 1, 'comment_id': comment_id, 'user_id': user_id,
+                   'reaction_type': rng.choice(['like', 'heart']), 'created_at': moment()}
+    elif table == 'collaborations':
+        for i in range(count):
+            project_id, user_id = _pair(i, projects, users)
+            yield {'id': i + 1, 'project_id': project_id, 'user_id': user_id, 'message': words(10),
+                   'status': rng.choice(['pending', 'accepted', 'accepted', 'rejected']), 'created_at': moment()}
+    elif table == 'donations':
+        for i in range(1, count + 1):
+            yield {'id': i, 'amount': rng.choice([5, 10, 25, 50, 100]), 'message': words(6),
+                   'project_id': rng.randint(1, projects), 'user_id': rng.randint(1, users),
+                   'created_at': moment()}
+    elif table == 'team_chats':
+        for i in range(1, count + 1):
+            yield {'id': i, 'message': words(8), 'project_id': rng.randint(1, projects),
+                   'user_id': rng.randint(1, users), 'created_at': moment(30)}
+    elif table == 'discussions':
+        for i in range(1, count + 1):
+            yield {'id': i, 'title': words(5).title(), 'content': words(60), 'tags': ','.join(rng.sample(_WORDS, 2)),
+                   'category': rng.choice(_DISCUSSION_CATEGORIES), 'user_id': rng.randint(1, users),
+                   'created_at': moment()}
+    elif table == 'discussion_replies':
+        # Replies to one discussion are consecutive ids; each chain of reply_depth nests under the previous reply
+        per_discussion = max(count // discussions, 1)
+        for i in range(count):
+            position = i % per_discussion
+            depth = position % reply_depth
+            yield {'id': i + 1, 'content': words(20), 'discussion_id': min(i // per_discussion, discussions - 1) + 1,
+                   'parent_reply_id': i if depth else None, 'user_id': rng.randint(1, users),
+                   'created_at': moment(14)}
+    elif table == 'discussion_likes':
+        for i in range(count):
+            discussion_id, user_id = _pair(i, discussions, users)
+            yield {'id': i + 1, 'discussion_id': discussion_id, 'user_id': user_id, 'created_at': moment(14)}
+    elif table == 'reply_reactions':
+        for i in range(count):
+            reply_id, user_id = _pair(i, volumes['discussion_replies'], users)
+            yield {'id': i + 1, 'reply_id': reply_id, 'user_id': user_id,
+                   'reaction_type': rng.choice(['like', 'heart']), 'created_at': moment(14)}
+    elif table == 'notifications':
+        for i in range(1, count + 1):
+            kind = rng.choice(_NOTIFICATION_TYPES)
+            yield {'id': i, 'type': kind, 'title': f'New {kind}', 'message': words(10),
+                   'is_read': rng.random() < 0.7, 'user_id': rng.randint(1, users),
+                   'related_user_id': rng.randint(1, users), 'project_id': rng.randint(1, projects),
+                   'created_at': moment(90)}
+
+
+def seed_volumes(scale=1.0, overrides=None):
+    """DEFAULT_VOLUMES multiplied by `scale`, with per-table `overrides`, capped so unique pairs exist"""
+    volumes = {table: max(int(count * scale), 1) for table, count in DEFAULT_VOLUMES.items()}
+    volumes.update(overrides or {})
+    unique_pairs = {'votes': 'projects', 'collaborations': 'projects', 'comment_reactions': 'comments',
+                    'discussion_likes': 'discussions', 'reply_reactions': 'discussion_replies'}
+    for table, parent in unique_pairs.items():
+        volumes[table] = min(volumes[table], volumes[parent] * volumes['users'])
+    return volumes
+
+
+def seed_dataset(volumes, reply_depth=DEFAULT_REPLY_DEPTH, seed=1, progress=None):
+    """Bulk-insert a synthetic dataset into an empty database.
+    
+    Rows are generated deterministically from `seed` and written with
+    executemany INSERTs in batches, then counters, hot scores and planner
+    statistics are brought up to date. `progress(table, rows)` is called
+    after each table.
+    """
+    rng = random.Random(seed)
+    models = {model.__tablename__: model for model in (
+        User, Project, Vote, Comment, CommentReply, CommentReaction, Collaboration, Donation, TeamChat,
+        Discussion, DiscussionReply, DiscussionLike, ReplyReaction, Notification)}
+    
+    for table, count in volumes.items():
+        statement = models[table].__table__.insert()
+        batch = []
+        for row in _rows(table, count, volumes, rng, reply_depth):
+            batch.append(row)
+            if len(batch) == _BATCH_SIZE:
+                db.session.execute(statement, batch)
+                batch = []
+        if batch:
+            db.session.execute(statement, batch)
+        db.session.commit()
+        if progress:
+            progress(table, count)
+    
+    if db.engine.dialect.name == 'postgresql':
+        # Ids were written explicitly; move each sequence past them
+        for table in volumes:
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"))
+        db.session.commit()
+    
+    reconcile_counters()
+    recompute_hot_scores()
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql('ANALYZE')
+
+
+def sample_ids():
+    """Ids to exercise endpoints with: the owner of the first project, that project and the first discussion"""
+    project = db.session.get(Project, 1)
+    owner = db.session.get(User, project.user_id)
+    return {'user': owner.id, 'username': owner.username, 'project': project.id, 'discussion': 1}
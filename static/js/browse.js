@@ -2,6 +2,7 @@
 
 let currentUser = null;
 let currentPage = 1;
+let nextCursor = null;
 let currentFilters = {
     search: '',
     category: '',
@@ -116,11 +117,16 @@ async function loadProjects() {
     
     try {
         const params = new URLSearchParams({
-            page: currentPage,
             per_page: 9,
-            sort: currentFilters.sort
+            sort: currentFilters.sort,
+            total: 'none'
         });
         
+        // Later pages continue from the cursor returned with the previous one
+        if (currentPage > 1 && nextCursor) {
+            params.append('cursor', nextCursor);
+        }
+        
         if (currentFilters.category) {
             params.append('category', currentFilters.category);
         }
@@ -134,10 +140,11 @@ async function loadProjects() {
         if (response.ok) {
             const data = await response.json();
             displayProjects(data.projects, currentPage === 1);
+            nextCursor = data.next_cursor;
             
             // Show/hide load more button
             if (loadMoreContainer) {
-                if (currentPage < data.pages) {
+                if (data.has_more) {
                     loadMoreContainer.style.display = 'block';
                 } else {
                     loadMoreContainer.style.display = 'none';
@@ -957,6 +957,60 @@ async function clearAllNotifications() {
 }
 
 function startNotificationPolling() {
+    // Prefer the server push stream; fall back to polling if it is unavailable
+    if (window.EventSource) {
+        const stream = new EventSource('/api/notifications/stream');
+        
+        stream.addEventListener('rooms', (event) => {
+            // Team chats delivered over this same stream; others are polled while open
+            streamChatRooms = JSON.parse(event.data).project_ids || [];
+            updateChatPolling();
+        });
+        
+        stream.addEventListener('chat_message', (event) => {
+            const message = JSON.parse(event.data);
+            if (currentChatProject && message.project_id === currentChatProject.id) {
+                appendChatMessage(message);
+            }
+        });
+        
+        stream.addEventListener('unread_count', (event) => {
+            unreadCount = JSON.parse(event.data).unread_count || 0;
+            updateNotificationCount();
+        });
+        
+        stream.addEventListener('notification', (event) => {
+            if (currentSection === 'notifications') {
+                notifications.unshift(JSON.parse(event.data));
+                displayFilteredNotifications();
+            }
+        });
+        
+        stream.addEventListener('resync', () => {
+            if (currentSection === 'notifications') {
+                loadNotifications();
+            }
+            if (currentChatProject) {
+                syncSidebarChatMessages(currentChatProject.id);
+            }
+        });
+        
+        stream.onerror = () => {
+            // EventSource reconnects on its own unless the server refused the stream,
+            // e.g. with a 503 when every stream slot in the worker is taken
+            if (stream.readyState === EventSource.CLOSED) {
+                streamChatRooms = [];
+                updateChatPolling();
+                pollNotificationCount();
+            }
+        };
+        return;
+    }
+    
+    pollNotificationCount();
+}
+
+function pollNotificationCount() {
     // Poll for new notifications every 30 seconds
     setInterval(async () => {
         try {
@@ -1199,6 +1253,10 @@ function displayEmptyTeam() {
 
 // Chat sidebar functionality
 let currentChatProject = null;
+let chatMessages = [];
+let chatHasMore = false;
+let streamChatRooms = [];  // Project IDs whose chat arrives over the notification stream
+let chatPollTimer = null;
 
 async function openProjectChatSidebar(projectId, projectTitle) {
     currentChatProject = { id: projectId, title: projectTitle };
@@ -1214,6 +1272,28 @@ async function openProjectChatSidebar(projectId, projectTitle) {
     
     await loadChatParticipants(projectId);
     await loadSidebarChatMessages(projectId);
+    updateChatPolling();
+}
+
+function updateChatPolling() {
+    // Without the stream (or for a room joined after it opened) fetch new messages by after_id
+    const streamed = currentChatProject && streamChatRooms.includes(currentChatProject.id);
+    if (currentChatProject && !streamed) {
+        if (!chatPollTimer) {
+            chatPollTimer = setInterval(() => {
+                if (currentChatProject) syncSidebarChatMessages(currentChatProject.id);
+            }, 5000);
+        }
+    } else if (chatPollTimer) {
+        clearInterval(chatPollTimer);
+        chatPollTimer = null;
+    }
+}
+
+function appendChatMessage(message) {
+    if (chatMessages.some(existing => existing.id === message.id)) return;
+    chatMessages.push(message);
+    displaySidebarChatMessages(chatMessages);
 }
 
 function closeChatSidebar() {
@@ -1224,6 +1304,7 @@ function closeChatSidebar() {
     container.classList.remove('chat-open');
     
     currentChatProject = null;
+    updateChatPolling();
 }
 
 async function loadChatParticipants(projectId) {
@@ -1255,13 +1336,62 @@ async function loadSidebarChatMessages(projectId) {
         const response = await fetch(`/api/projects/${projectId}/chat`);
         if (response.ok) {
             const data = await response.json();
-            displaySidebarChatMessages(data.messages || []);
+            chatMessages = data.messages || [];
+            chatHasMore = data.has_more;
+            displaySidebarChatMessages(chatMessages);
         }
     } catch (error) {
         console.error('Error loading chat messages:', error);
     }
 }
 
+async function loadOlderChatMessages() {
+    if (!currentChatProject || !chatHasMore || chatMessages.length === 0) return;
+    
+    const projectId = currentChatProject.id;
+    chatHasMore = false;
+    
+    try {
+        const response = await fetch(`/api/projects/${projectId}/chat?before_id=${chatMessages[0].id}`);
+        if (response.ok && currentChatProject && currentChatProject.id === projectId) {
+            const data = await response.json();
+            const container = document.getElementById('sidebar-chat-messages');
+            const previousHeight = container ? container.scrollHeight : 0;
+            
+            chatMessages = (data.messages || []).concat(chatMessages);
+            chatHasMore = data.has_more;
+            displaySidebarChatMessages(chatMessages);
+            
+            // Keep the reader's place instead of jumping to the newest message
+            if (container) container.scrollTop = container.scrollHeight - previousHeight;
+        }
+    } catch (error) {
+        console.error('Error loading older chat messages:', error);
+    }
+}
+
+async function syncSidebarChatMessages(projectId) {
+    // Fetch only what arrived after the last message we have
+    if (chatMessages.length === 0) {
+        return loadSidebarChatMessages(projectId);
+    }
+    
+    try {
+        const lastId = chatMessages[chatMessages.length - 1].id;
+        const response = await fetch(`/api/projects/${projectId}/chat?after_id=${lastId}`);
+        if (response.ok) {
+            const data = await response.json();
+            if (data.has_more) {
+                // Too far behind to catch up incrementally; start again from the latest page
+                return loadSidebarChatMessages(projectId);
+            }
+            (data.messages || []).forEach(appendChatMessage);
+        }
+    } catch (error) {
+        console.error('Error syncing chat messages:', error);
+    }
+}
+
 function displaySidebarChatMessages(messages) {
     const container = document.getElementById('sidebar-chat-messages');
     if (!container) return;
@@ -1287,6 +1417,9 @@ function displaySidebarChatMessages(messages) {
     `).join('');
     
     container.scrollTop = container.scrollHeight;
+    container.onscroll = () => {
+        if (container.scrollTop === 0) loadOlderChatMessages();
+    };
 }
 
 async function sendSidebarMessage() {
@@ -1311,20 +1444,8 @@ async function sendSidebarMessage() {
         
         if (response.ok) {
             input.value = '';
-            await loadSidebarChatMessages(currentChatProject.id);
-            
-            // Refresh notification count after sending chat message
-            // This ensures any new notifications are reflected in the badge
-            try {
-                const notificationResponse = await fetch('/api/notifications/count');
-                if (notificationResponse.ok) {
-                    const notificationData = await notificationResponse.json();
-                    unreadCount = notificationData.unread_count || 0;
-                    updateNotificationCount();
-                }
-            } catch (e) {
-                console.log('Error refreshing notification count:', e);
-            }
+            const data = await response.json();
+            appendChatMessage(data.chat_message);
         } else {
             const data = await response.json();
             showMessage(data.error || 'Error sending message', 'error');
@@ -2,6 +2,7 @@
 
 let currentUser = null;
 let currentPage = 1;
+let nextCursor = null;
 let currentFilters = {
     search: '',
     category: '',
@@ -165,12 +166,9 @@ function handleImageUpload(event) {
         return;
     }
 
-    const reader = new FileReader();
-    reader.onload = function(e) {
-        mediaData = e.target.result;
-        showImagePreview(e.target.result);
-    };
-    reader.readAsDataURL(file);
+    // Keep the File itself; it is uploaded as multipart when the post is submitted
+    selectedMedia = file;
+    showImagePreview(URL.createObjectURL(file));
 }
 
 function showImagePreview(src) {
@@ -189,6 +187,7 @@ function removeImage() {
     
     if (preview) preview.style.display = 'none';
     if (input) input.value = '';
+    selectedMedia = null;
     mediaData = null;
 }
 
@@ -226,13 +225,22 @@ async function handleDiscussionSubmit(event) {
         tags: formData.get('tags') ? formData.get('tags').split(',').map(tag => tag.trim()).filter(tag => tag) : []
     };
     
-    // Add image data if present
-    if (mediaData) {
-        data.media_data = mediaData;
-        data.media_type = 'image';
-    }
-
     try {
+        // Upload the image first and reference it by ID
+        if (selectedMedia) {
+            const uploadData = new FormData();
+            uploadData.append('file', selectedMedia);
+            const uploadResponse = await fetch('/api/media', {
+                method: 'POST',
+                body: uploadData
+            });
+            const uploadResult = await uploadResponse.json();
+            if (!uploadResponse.ok) {
+                throw new Error(uploadResult.error || 'Failed to upload image');
+            }
+            data.media_id = uploadResult.media.id;
+        }
+
         const response = await fetch('/api/discussions', {
             method: 'POST',
             headers: {
@@ -278,12 +286,16 @@ async function loadDiscussions() {
 
     try {
         const params = new URLSearchParams({
-            page: currentPage,
             search: currentFilters.search,
             category: currentFilters.category,
             sort: currentFilters.sort,
-            has_more: true
+            total: 'none'
         });
+        
+        // Later pages continue from the cursor returned with the previous one
+        if (currentPage > 1 && nextCursor) {
+            params.append('cursor', nextCursor);
+        }
 
         const response = await fetch(`/api/discussions?${params}`);
         const data = await response.json();
@@ -297,6 +309,7 @@ async function loadDiscussions() {
                 showEmptyState();
             } else {
                 renderDiscussions(data.discussions);
+                nextCursor = data.next_cursor;
                 updateLoadMoreButton(data.has_more);
             }
         } else {
@@ -354,6 +367,7 @@ function createDiscussionCard(discussion) {
         </div>
     ` : '';
 
+    // Search snippets arrive HTML-escaped from the server, with <mark> around matched terms
     card.innerHTML = `
         ${editOverlay}
         <div class="discussion-header-card">
@@ -370,7 +384,7 @@ function createDiscussionCard(discussion) {
         </div>
         
         <div class="discussion-content">
-            ${escapeHtml(discussion.content).substring(0, 300)}${discussion.content.length > 300 ? '...' : ''}
+            ${discussion.snippet ? discussion.snippet : `${escapeHtml(discussion.content).substring(0, 300)}${discussion.content.length > 300 ? '...' : ''}`}
         </div>
         
         ${imageSection}
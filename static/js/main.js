@@ -152,7 +152,7 @@ async function loadStats() {
             updateStatsElements(data.totalProjects, data.totalUsers, data.totalFunding);
         } else {
             // Fallback to projects API if homepage stats not available
-            const projectsResponse = await fetch('/api/projects?per_page=1000');
+            const projectsResponse = await fetch('/api/projects?per_page=100&total=exact');
             if (projectsResponse.ok) {
                 const projectsData = await projectsResponse.json();
                 updateStats(projectsData);
@@ -167,7 +167,7 @@ async function loadStats() {
 
 function updateStats(data) {
     const projects = data.projects || [];
-    const totalProjects = projects.length;
+    const totalProjects = data.total ?? projects.length;
     const totalUsers = new Set(projects.map(p => p.owner?.id)).size;
     const totalFunding = projects.reduce((sum, p) => sum + (p.current_funding || 0), 0);
     
@@ -0,0 +1,81 @@
+import threading
+import time
+from flask import current_app
+from sqlalchemy import event
+from app import db
+
+# name -> (expires_at, value, tables the value was computed from)
+_entries = {}
+_lock = threading.Lock()
+_compute_locks = {}
+# Bumped on every invalidation so a computation that raced a commit is not cached
+_generation = 0
+
+
+def cached_stats(name, tables, compute):
+    """Return compute() for `name`, cached for STATS_CACHE_TTL seconds.
+    
+    The entry is dropped as soon as a transaction that wrote to any of
+    `tables` commits, so the TTL only bounds staleness from writes made
+    outside this process. Concurrent misses wait for a single computation
+    instead of each running the aggregates.
+    """
+    entry = _entries.get(name)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    
+    with _lock:
+        compute_lock = _compute_locks.setdefault(name, threading.Lock())
+    
+    with compute_lock:
+        entry = _entries.get(name)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        
+        generation = _generation
+        value = compute()
+        with _lock:
+            if generation == _generation:
+                _entries[name] = (time.monotonic() + current_app.config['STATS_CACHE_TTL'], value, frozenset(tables))
+        return value
+
+
+def invalidate_stats(tables):
+    """Drop cached statistics computed from any of `tables`"""
+    global _generation
+    tables = set(tables)
+    with _lock:
+        _generation += 1
+        for name, entry in list(_entries.items()):
+            if entry[2] & tables:
+                _entries.pop(name, None)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_written_tables(session, flush_context):
+    touched = session.info.setdefault('written_tables', set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(instance, '__tablename__', None)
+        if table and (instance not in session.dirty or session.is_modified(instance)):
+            touched.add(table)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _record_bulk_writes(orm_execute_state):
+    # Bulk INSERT/DELETE statements bypass the flush; counter UPDATEs never change a statistic
+    if orm_execute_state.is_insert or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            orm_execute_state.session.info.setdefault('written_tables', set()).add(table.name)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    touched = session.info.pop('written_tables', None)
+    if touched:
+        invalidate_stats(touched)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back(session):
+    session.info.pop('written_tables', None)
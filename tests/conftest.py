@@ -0,0 +1,24 @@
+import os
+import sys
+
+# The app is configured from the environment when it is imported
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ.setdefault('SESSION_SECRET', 'test')
+os.environ['METRICS_ENABLED'] = 'false'
+os.environ['QUERY_STATS_ENABLED'] = 'false'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from app import app, db  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app_context():
+    """An application context over the migrated in-memory schema, emptied again after the module"""
+    with app.app_context():
+        yield
+        db.session.remove()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
@@ -0,0 +1,74 @@
+"""Cursors round-trip and anything else is rejected with InvalidCursor before it reaches a query"""
+import base64
+import json
+from datetime import datetime
+import pytest
+from app import app
+import routes  # noqa: F401
+from models import Project
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+
+RECENT = [(Project.created_at, True), (Project.id, True)]
+POPULAR = [(Project.vote_count, True), (Project.id, True)]
+FUNDING = [(Project.current_funding, True), (Project.id, True)]
+
+
+def token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def test_cursor_round_trips():
+    created = datetime(2024, 5, 1, 12, 30)
+    assert decode_cursor(encode_cursor([created, 7], RECENT), RECENT) == [created, 7]
+    assert decode_cursor(encode_cursor([12.5, 7], FUNDING), FUNDING) == [12.5, 7]
+    assert decode_cursor(encode_cursor([3, 7], POPULAR), POPULAR) == [3, 7]
+
+
+def test_cursor_from_another_sort_is_rejected():
+    # Same shape and types, different ordering
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor([3, 7], POPULAR), FUNDING)
+
+
+@pytest.mark.parametrize('values, sort_keys', [
+    (['a', 'b'], POPULAR),
+    ([3, '7'], POPULAR),
+    ([3.5, 7], POPULAR),
+    ([True, 7], POPULAR),
+    ([None, 7], POPULAR),
+    ([3, 7, 9], POPULAR),
+    (['yesterday', 7], RECENT),
+    ([20240501, 7], RECENT),
+    (['NaN', 7], FUNDING),
+])
+def test_mistyped_cursor_values_are_rejected(values, sort_keys):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token({'k': [column.key for column, _ in sort_keys], 'v': values}), sort_keys)
+
+
+def test_non_finite_numbers_are_rejected():
+    # json accepts NaN and Infinity, which never match a stored row
+    with pytest.raises(InvalidCursor):
+        decode_cursor(base64.urlsafe_b64encode(b'{"k":["current_funding","id"],"v":[NaN,7]}').decode(), FUNDING)
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', token(['a', 'b']), token({'k': ['vote_count', 'id'], 'v': ['a', 'b']})])
+@pytest.mark.parametrize('url', ['/api/projects', '/api/discussions', '/api/users'])
+def test_listings_answer_bad_cursors_with_400(url, cursor):
+    with app.app_context():
+        response = app.test_client().get(url, query_string={'sort': 'popular', 'cursor': cursor})
+    assert response.status_code == 400, response.get_data(as_text=True)
+
+
+def test_trending_accepts_only_its_own_window_cursors():
+    with app.app_context():
+        client = app.test_client()
+        hour = token({'k': ['trending_hour_score', 'discussion_id'], 'v': [2.5, 7]})
+        assert client.get('/api/discussions/trending', query_string={'window': 'hour', 'cursor': hour}).status_code == 200
+        for window, cursor in [('hour', token(['a', 'b'])),
+                               ('hour', token({'k': ['trending_hour_score', 'discussion_id'], 'v': ['a', 'b']})),
+                               ('day', hour),
+                               ('hour', token({'k': ['score', 'id'], 'v': [2.5, 7]}))]:
+            for url, sort in [('/api/discussions/trending', None), ('/api/discussions', 'trending')]:
+                response = client.get(url, query_string={'sort': sort, 'window': window, 'cursor': cursor})
+                assert response.status_code == 400, (url, window, response.get_data(as_text=True))
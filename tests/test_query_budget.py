@@ -0,0 +1,84 @@
+"""Serializing a page must cost a fixed number of queries, however many rows it holds"""
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from app import app, db
+import routes  # noqa: F401
+from models import (User, Project, Vote, Comment, ProjectAttachment, Collaboration, Discussion, DiscussionLike,
+                    DiscussionReply, reconcile_counters)
+
+PASSWORD = 'password123'
+N = 5
+
+ENDPOINTS = [
+    '/api/projects?per_page=100&total=none',
+    '/api/discussions?per_page=100&total=none',
+    '/api/users/{owner}/profile',
+    '/api/dashboard/stats',
+]
+
+
+def add_rows(owner, others, count):
+    """`count` more projects and discussions by `owner`, each with votes, comments, likes and replies"""
+    for _ in range(count):
+        project = Project(title='Solar campus', description='Panels on the library roof', category='Technology',
+                          funding_goal=1000, user_id=owner.id)
+        discussion = Discussion(title='Garden ideas', content='What should we plant?', category='Ideas',
+                                user_id=owner.id)
+        db.session.add_all([project, discussion])
+        db.session.flush()
+        db.session.add(ProjectAttachment(filename='plan.pdf', original_filename='plan.pdf', file_size=1,
+                                         file_type='application/pdf', file_path='plan.pdf',
+                                         project_id=project.id, user_id=owner.id))
+        for user in others:
+            db.session.add_all([
+                Vote(project_id=project.id, user_id=user.id, is_upvote=True),
+                Comment(content='Count me in', project_id=project.id, user_id=user.id),
+                Collaboration(project_id=project.id, user_id=user.id, message='Can I help?'),
+                DiscussionLike(discussion_id=discussion.id, user_id=user.id),
+                DiscussionReply(content='Tomatoes', discussion_id=discussion.id, user_id=user.id),
+            ])
+    db.session.commit()
+    reconcile_counters()
+
+
+def count_queries(client, url):
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return len(statements)
+
+
+@pytest.fixture(scope='module')
+def context(app_context):
+    owner = User(username='owner', email='owner@example.edu', full_name='Owner', college='MIT',
+                 password_hash=generate_password_hash(PASSWORD))
+    others = [User(username=f'member{i}', email=f'member{i}@example.edu', full_name=f'Member {i}',
+                   college='MIT', password_hash=generate_password_hash(PASSWORD)) for i in range(3)]
+    db.session.add_all([owner] + others)
+    db.session.commit()
+    
+    client = app.test_client()
+    response = client.post('/api/login', json={'username': 'owner', 'password': PASSWORD})
+    assert response.status_code == 200
+    yield owner, others, client
+
+
+def test_query_budget_does_not_grow_with_page_size(context):
+    owner, others, client = context
+    urls = [url.format(owner=owner.id) for url in ENDPOINTS]
+    
+    add_rows(owner, others, N)
+    small = {url: count_queries(client, url) for url in urls}
+    add_rows(owner, others, 2 * N)
+    large = {url: count_queries(client, url) for url in urls}
+    
+    assert large == small
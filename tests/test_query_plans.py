@@ -0,0 +1,9 @@
+"""Every filtered query the API runs must be answered from an index (see query_plans.py)"""
+import routes  # noqa: F401
+from query_plans import check_query_plans, describe_regression, seed_plan_dataset
+
+
+def test_api_queries_use_indexes(app_context):
+    ids = seed_plan_dataset()
+    regressions = check_query_plans(ids)
+    assert regressions == [], '\n'.join(describe_regression(*regression) for regression in regressions)
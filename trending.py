@@ -0,0 +1,267 @@
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sortedcontainers import SortedList
+from sqlalchemy import Float, Integer, event, literal_column
+from app import db
+from models import Discussion, DiscussionLike, DiscussionReply
+from pagination import decode_cursor, encode_cursor
+
+# Sliding windows a discussion's activity is counted over, in seconds
+WINDOWS = {'hour': 3600, 'day': 86400, 'week': 7 * 86400}
+
+# Ranking key for activity across every category
+ALL_CATEGORIES = None
+
+
+class TrendingIndex:
+    """In-memory ranking of discussions by recent likes and replies.
+    
+    Every window keeps a score per discussion (the weighted activity inside
+    the window), a SortedList per category ordered by score, and a min-heap of
+    the activity events so they are subtracted again once they age out. Events
+    carry the time they happened, so undoing a like cancels exactly the
+    contribution that like made. Only this worker's writes are applied
+    incrementally; resync() rebuilds from the database to pick up the rest.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._reset()
+        self.synced_at = None
+        self._replay = None
+    
+    def _reset(self):
+        self._categories = {}
+        self._scores = {window: {} for window in WINDOWS}
+        self._ranked = {window: {} for window in WINDOWS}
+        self._expiry = {window: [] for window in WINDOWS}
+    
+    def record(self, discussion_id, category, weight, at):
+        """Apply `weight` of activity that happened at `at` (epoch seconds)"""
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(('record', discussion_id, category, weight, at))
+            self._record(discussion_id, category, weight, at, time.time())
+    
+    def recategorize(self, discussion_id, category):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(('recategorize', discussion_id, category))
+            self._recategorize(discussion_id, category)
+    
+    def remove(self, discussion_id):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(('remove', discussion_id))
+            self._remove(discussion_id)
+    
+    def top(self, window, category=ALL_CATEGORIES, after=None, limit=10):
+        """Return up to `limit` (discussion_id, score) pairs, best first.
+        
+        `after` is the (score, discussion_id) of the last item of the previous
+        page. Also returns the number of discussions ranked for the category.
+        """
+        with self._lock:
+            self._expire(time.time())
+            ranked = self._ranked[window].get(category)
+            if not ranked:
+                return [], 0
+            start = ranked.bisect_right((-after[0], after[1])) if after else 0
+            page = [(discussion_id, -negative) for negative, discussion_id in ranked[start:start + limit]]
+            return page, len(ranked)
+    
+    def resync(self, events):
+        """Rebuild every window from `events`, a list of (discussion_id, category, weight, at).
+        
+        Activity recorded while the caller was reading `events` is replayed on
+        top of the rebuilt state so it is not lost.
+        """
+        with self._lock:
+            replay, self._replay = self._replay or [], None
+            self._reset()
+            now = time.time()
+            for discussion_id, category, weight, at in events:
+                self._record(discussion_id, category, weight, at, now)
+            for entry in replay:
+                if entry[0] == 'record':
+                    self._record(*entry[1:], now)
+                elif entry[0] == 'recategorize':
+                    self._recategorize(*entry[1:])
+                else:
+                    self._remove(*entry[1:])
+            self.synced_at = now
+    
+    def begin_resync(self):
+        """Start buffering activity for replay; returns False if a resync is already running"""
+        with self._lock:
+            if self._replay is not None:
+                return False
+            self._replay = []
+            return True
+    
+    def abort_resync(self):
+        with self._lock:
+            self._replay = None
+    
+    def _record(self, discussion_id, category, weight, at, now):
+        self._expire(now)
+        if discussion_id in self._categories:
+            self._recategorize(discussion_id, category)
+        else:
+            self._categories[discussion_id] = category
+        
+        for window, seconds in WINDOWS.items():
+            if at <= now - seconds:
+                continue  # already outside this window
+            heapq.heappush(self._expiry[window], (at + seconds, next(self._sequence), discussion_id, weight))
+            self._adjust(window, discussion_id, weight)
+    
+    def _adjust(self, window, discussion_id, delta):
+        scores = self._scores[window]
+        category = self._categories.get(discussion_id)
+        old = scores.get(discussion_id, 0)
+        if old > 0:
+            for key in (ALL_CATEGORIES, category):
+                self._ranked[window][key].discard((-old, discussion_id))
+        
+        # Scores may dip below zero when an undo arrives for activity another worker recorded;
+        # they are kept so the books balance when both events expire, but only positive ones rank
+        new = old + delta
+        if abs(new) > 1e-9:
+            scores[discussion_id] = new
+        else:
+            scores.pop(discussion_id, None)
+        if new > 1e-9:
+            for key in (ALL_CATEGORIES, category):
+                self._ranked[window].setdefault(key, SortedList()).add((-new, discussion_id))
+    
+    def _expire(self, now):
+        for window in WINDOWS:
+            expiry = self._expiry[window]
+            while expiry and expiry[0][0] <= now:
+                _, _, discussion_id, weight = heapq.heappop(expiry)
+                if discussion_id in self._categories:
+                    self._adjust(window, discussion_id, -weight)
+    
+    def _recategorize(self, discussion_id, category):
+        old_category = self._categories.get(discussion_id)
+        if discussion_id not in self._categories or old_category == category:
+            return
+        for window in WINDOWS:
+            score = self._scores[window].get(discussion_id, 0)
+            if score > 0:
+                self._ranked[window][old_category].discard((-score, discussion_id))
+                self._ranked[window].setdefault(category, SortedList()).add((-score, discussion_id))
+        self._categories[discussion_id] = category
+    
+    def _remove(self, discussion_id):
+        for window in WINDOWS:
+            score = self._scores[window].get(discussion_id)
+            if score is not None:
+                self._adjust(window, discussion_id, -score)
+        self._categories.pop(discussion_id, None)
+
+
+trending = TrendingIndex()
+
+
+def _cursor_keys(window):
+    # Shape of a trending page cursor: the last item's (score, discussion id). decode_cursor
+    # checks the types and the names, which differ per window and from discussion search's
+    return [(literal_column(f'trending_{window}_score', Float), True), (literal_column('discussion_id', Integer), True)]
+
+
+def _epoch(moment):
+    # Model timestamps are naive UTC
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+def record_activity(discussion, kind, count=1, at=None):
+    """Queue a 'like' or 'reply' on `discussion`, applied to the index when the caller's transaction commits.
+    
+    Undo activity (an unlike, a deleted reply) with count=-1 and the original
+    timestamp so exactly its contribution is withdrawn.
+    """
+    if discussion is None:
+        return
+    weight = count * current_app.config['TRENDING_LIKE_WEIGHT' if kind == 'like' else 'TRENDING_REPLY_WEIGHT']
+    db.session.info.setdefault('trending_activity', []).append(
+        ('record', discussion.id, discussion.category, weight, _epoch(at or datetime.utcnow())))
+
+
+def record_recategorized(discussion):
+    db.session.info.setdefault('trending_activity', []).append(('recategorize', discussion.id, discussion.category))
+
+
+def record_removed(discussion_id):
+    db.session.info.setdefault('trending_activity', []).append(('remove', discussion_id))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_after_commit(session):
+    for entry in session.info.pop('trending_activity', []):
+        if entry[0] == 'record':
+            trending.record(*entry[1:])
+        elif entry[0] == 'recategorize':
+            trending.recategorize(*entry[1:])
+        else:
+            trending.remove(*entry[1:])
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('trending_activity', None)
+
+
+def resync_trending():
+    """Rebuild the index from the last week of likes and replies; returns False if one is already running"""
+    if not trending.begin_resync():
+        return False
+    
+    try:
+        since = datetime.utcnow() - timedelta(seconds=max(WINDOWS.values()))
+        sources = [
+            (DiscussionLike, current_app.config['TRENDING_LIKE_WEIGHT']),
+            (DiscussionReply, current_app.config['TRENDING_REPLY_WEIGHT']),
+        ]
+        events = []
+        for model, weight in sources:
+            rows = db.session.query(model.discussion_id, Discussion.category, model.created_at)\
+                             .join(Discussion, Discussion.id == model.discussion_id)\
+                             .filter(model.created_at > since).all()
+            events.extend((discussion_id, category, weight, _epoch(created_at))
+                          for discussion_id, category, created_at in rows)
+    except Exception:
+        trending.abort_resync()
+        raise
+    
+    trending.resync(events)
+    return True
+
+
+def trending_page(window, category=None, cursor=None, limit=10):
+    """A page of (discussion_id, score) for `window`, plus the next cursor and the ranked count.
+    
+    The index is rebuilt from the database when it is older than
+    TRENDING_RESYNC_SECONDS (or on first use); otherwise no query is made.
+    Raises InvalidCursor unless `cursor` came from this window's pages.
+    """
+    # Before the resync, so a bad cursor costs no query
+    after = decode_cursor(cursor, _cursor_keys(window)) if cursor else None
+    
+    synced_at = trending.synced_at
+    if synced_at is None or time.time() - synced_at > current_app.config['TRENDING_RESYNC_SECONDS']:
+        resync_trending()
+    
+    page, total = trending.top(window, category or ALL_CATEGORIES, after, limit + 1)
+    
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor([page[-1][1], page[-1][0]], _cursor_keys(window))
+    return page, next_cursor, total